@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it sees every query the other middleware and the view run
+    'api.profiling.QueryProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -123,3 +125,31 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Django REST framework
+# Lists are paginated with keyset cursors over their ordering (see api/pagination.py):
+# no OFFSET and no COUNT(*), and ?page_size= can't go past the paginator's max_page_size.
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': 20,
+}
+
+
+# Query profiling (see api/profiling.py)
+# Views over their query budget fail loudly while developing and in tests, and
+# are logged as warnings in production.
+QUERY_BUDGETS_ENFORCE = DEBUG
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # One JSON line per request with its query count, SQL time and slowest statements
+        # (with DEBUG on the X-Query-Profile header carries them and only overruns are logged)
+        'api.queries': {'handlers': ['console'], 'level': 'WARNING' if DEBUG else 'INFO', 'propagate': False},
+    },
+}
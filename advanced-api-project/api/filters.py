@@ -1,4 +1,10 @@
+import operator
+from functools import reduce
+
 import django_filters
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework import filters
 from .models import Book
 
 class BookFilter(django_filters.FilterSet):
@@ -25,4 +31,47 @@ class BookFilter(django_filters.FilterSet):
             'title': ['exact', 'icontains'], # Allows exact title match and case-insensitive partial search
             'author': ['exact'],            # Filter by Author ID (author=1)
             'publication_year': ['exact'],  # Redundant but kept for clean Meta definition
-        }
\ No newline at end of file
+        }
+
+
+# SearchFilter that only runs lookups an index can serve.
+# - '^title' becomes title__iprefix (see api/lookups.py) instead of
+#   title__istartswith, which no index can serve.
+# - A search over several fields is a UNION of per-field matches instead of
+#   one WHERE with OR: an OR across the author join defeats every index and
+#   scans all the books.
+# - A field behind a foreign key (author__name) is searched in the related
+#   table first, then followed back through the key's index.
+# Terms shorter than min_indexed_length keep the OR: they match so many books that
+# reading the list's ordering index until a page is full beats collecting every match.
+class IndexedSearchFilter(filters.SearchFilter):
+    lookup_prefixes = {**filters.SearchFilter.lookup_prefixes, '^': 'iprefix'}
+    min_indexed_length = 3  # trigrams need three characters
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+
+        if not search_fields or not search_terms:
+            return queryset
+
+        orm_lookups = [
+            self.construct_search(str(search_field), queryset)
+            for search_field in search_fields
+        ]
+        for term in search_terms:
+            if len(term) < self.min_indexed_length:
+                queryset = queryset.filter(reduce(operator.or_, (Q(**{orm_lookup: term}) for orm_lookup in orm_lookups)))
+                continue
+            matches = [self.matching(queryset.model, orm_lookup, term) for orm_lookup in orm_lookups]
+            queryset = queryset.filter(pk__in=matches[0].union(*matches[1:]))
+        return queryset
+
+    def matching(self, model, orm_lookup, term):
+        """Primary keys of the `model` rows where `orm_lookup` matches `term`."""
+        name, _, rest = orm_lookup.partition(LOOKUP_SEP)
+        field = model._meta.get_field(name) if name != 'pk' else model._meta.pk
+        if field.many_to_one and LOOKUP_SEP in rest:
+            related = self.matching(field.related_model, rest, term)
+            return model._default_manager.filter(**{f'{name}__in': related}).values('pk')
+        return model._default_manager.filter(**{orm_lookup: term}).values('pk')
@@ -0,0 +1,42 @@
+from django.db.models import CharField, Lookup, TextField
+from django.db.models.functions import Lower
+from django.db.models.lookups import GreaterThanOrEqual, IStartsWith, LessThan, StartsWith
+
+# Indexable case-insensitive prefix lookup.
+# Django's istartswith compiles to UPPER(col) LIKE UPPER('abc%') on PostgreSQL
+# and col LIKE 'abc%' on SQLite, neither of which an index can serve. iprefix
+# compares LOWER(col), which the book title's expression indexes cover (see
+# migration 0003): with LIKE on PostgreSQL, where the index uses text_pattern_ops,
+# and elsewhere as the range LOWER(col) >= 'abc' AND LOWER(col) < 'abd', which
+# any B-tree can read (SQLite only uses an index for LIKE on a bare column).
+# SQLite's LOWER() only folds ASCII letters, so the range would miss 'Élan' for
+# 'Éla': prefixes with other characters fall back to istartswith there.
+
+
+class IPrefix(Lookup):
+    lookup_name = 'iprefix'
+
+    def get_prep_lookup(self):
+        return str(super().get_prep_lookup())
+
+    def as_sql(self, compiler, connection):
+        if connection.vendor != 'postgresql' and not self.rhs.isascii():
+            return compiler.compile(IStartsWith(self.lhs, self.rhs))
+        lower, prefix = Lower(self.lhs), self.rhs.lower()
+        conditions = [StartsWith(lower, prefix)]
+        if connection.vendor != 'postgresql' and prefix:
+            conditions.append(GreaterThanOrEqual(lower, prefix))
+            # The first string past every one that starts with the prefix
+            last = ord(prefix[-1])
+            if last < 0x10FFFF:
+                conditions.append(LessThan(lower, prefix[:-1] + chr(last + 1)))
+        sql, params = [], []
+        for condition in conditions:
+            condition_sql, condition_params = compiler.compile(condition)
+            sql.append(condition_sql)
+            params.extend(condition_params)
+        return ' AND '.join(sql), params
+
+
+CharField.register_lookup(IPrefix)
+TextField.register_lookup(IPrefix)
@@ -0,0 +1,98 @@
+import random
+import statistics
+import string
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.filters import IndexedSearchFilter
+from api.models import Author, Book
+from api.views import BookListCreateAPIView
+
+
+class Command(BaseCommand):
+    help = ("Compare DRF's SearchFilter with IndexedSearchFilter on the book list's first page, for "
+            'searches that match a title prefix, an author, nothing, and many books. '
+            'With --generate, first add that many synthetic books (one author per ten books).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--generate', type=int, default=0, metavar='BOOKS',
+                            help='Synthetic books to add before benchmarking.')
+        parser.add_argument('--requests', type=int, default=20, help='Runs per search and filter.')
+        parser.add_argument('--explain', action='store_true', help="Print each query's plan.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        if options['generate']:
+            self.generate(options['generate'])
+        book = Book.objects.select_related('author').order_by('?').first()
+        if book is None:
+            raise CommandError('There are no books; run with --generate first.')
+
+        word = book.title.split()[0]
+        searches = [
+            ('title prefix', word[:max(len(word) - 1, 3)]),
+            ('author name', book.author.name[-6:]),
+            ('no match', 'zzzzzz'),
+            ('three letters', word[:3]),
+            ('one letter', word[0]),
+        ]
+        view = BookListCreateAPIView()
+        self.stdout.write(f'{Book.objects.count()} books; {options["requests"]} runs per search')
+        self.stdout.write(f'{"search":<28}{"filter":<22}{"matches":>9}{"p50 ms":>9}{"p95 ms":>9}')
+        for name, term in searches:
+            for backend in (SearchFilter(), IndexedSearchFilter()):
+                request = Request(APIRequestFactory().get('/', {'search': term}))
+                view.request = request
+                queryset = backend.filter_queryset(request, view.get_queryset(), view).order_by('title', 'pk')[:20]
+                result = self.run(queryset, options['requests'])
+                label = f'{name} ({term})'
+                self.stdout.write(
+                    f'{label:<28}{type(backend).__name__:<22}{result["rows"]:>9}{result["p50"]:>9.2f}{result["p95"]:>9.2f}'
+                )
+                if options['explain']:
+                    self.stdout.write(queryset.explain())
+
+    def run(self, queryset, requests):
+        latencies = []
+        rows = 0
+        for _ in range(requests + 1):
+            started = time.perf_counter()
+            rows = len(queryset._chain())  # a fresh queryset each time, not the cached rows
+            latencies.append(time.perf_counter() - started)
+        latencies = sorted(latencies[1:])  # the first run warms up
+        return {
+            'rows': rows,
+            'p50': statistics.median(latencies) * 1000,
+            'p95': latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000,
+        }
+
+    def generate(self, count):
+        batch_size = 5000
+        authors = [Author(name=self.name()) for _ in range(max(count // 10, 1))]
+        with transaction.atomic():
+            Author.objects.bulk_create(authors, batch_size=batch_size)
+            author_ids = [author.pk for author in authors]
+            if None in author_ids:  # backends that don't return the new primary keys
+                author_ids = list(Author.objects.order_by('-pk').values_list('pk', flat=True)[:len(authors)])
+            for start in range(0, count, batch_size):
+                Book.objects.bulk_create([
+                    Book(title=self.title(), publication_year=self.random.randint(1800, 2025),
+                         author_id=self.random.choice(author_ids))
+                    for _ in range(start, min(start + batch_size, count))
+                ])
+        self.stdout.write(f'Created {count} books by {len(authors)} authors.')
+
+    def word(self):
+        return ''.join(self.random.choices(string.ascii_lowercase, k=self.random.randint(3, 9)))
+
+    def name(self):
+        return f'{self.word().title()} {self.word().title()}'
+
+    def title(self):
+        return ' '.join(self.word() for _ in range(self.random.randint(1, 5))).capitalize()
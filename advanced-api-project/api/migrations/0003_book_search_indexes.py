@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:45
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# PostgreSQL only, so not in the models' Meta (see api/lookups.py):
+# - LIKE 'abc%' can only use a text_pattern_ops index unless the database collation is C
+# - author__name's icontains (UPPER(name) LIKE '%abc%') needs a trigram index
+POSTGRES_INDEXES = {
+    'api_book_title_prefix_idx': 'CREATE INDEX api_book_title_prefix_idx ON api_book (LOWER(title) text_pattern_ops)',
+    'api_author_name_trgm_idx': 'CREATE INDEX api_author_name_trgm_idx ON api_author USING gin (UPPER(name) gin_trgm_ops)',
+}
+
+
+def create_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for sql in POSTGRES_INDEXES.values():
+        schema_editor.execute(sql)
+
+
+def drop_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in POSTGRES_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_book_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(django.db.models.functions.text.Lower('title'), name='api_book_title_lower_idx'),
+        ),
+        migrations.RunPython(create_postgres_indexes, drop_postgres_indexes),
+    ]
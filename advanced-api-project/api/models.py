@@ -1,10 +1,17 @@
 from django.db import models
+from django.db.models.functions import Lower
 
 # # The Author model represents a book author in the system.
 # Each author can be linked to multiple books (one-to-many relationship).
 class Author(models.Model):
     name = models.CharField(max_length=100)
 
+    class Meta:
+        indexes = [
+            # The book list's ?ordering=author__name (see api/pagination.py)
+            models.Index(fields=['name', 'id'], name='api_author_name_idx'),
+        ]
+
 
 # The Book model represents individual books in the system.
 # Each book is linked to exactly one Author through a foreign key.
@@ -13,4 +20,14 @@ class Author(models.Model):
 class Book(models.Model):
     title = models.CharField(max_length=200)
     publication_year = models.IntegerField()
-    author = models.ForeignKey(Author, related_name='books', on_delete=models.CASCADE)
\ No newline at end of file
+    author = models.ForeignKey(Author, related_name='books', on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            # The book list's orderings, with the primary key tiebreaker its cursor pages
+            # read from (see api/pagination.py)
+            models.Index(fields=['title', 'id'], name='api_book_title_idx'),
+            models.Index(fields=['publication_year', 'id'], name='api_book_year_idx'),
+            # ?search= on '^title': the iprefix lookup's range over LOWER(title) (see api/lookups.py)
+            models.Index(Lower('title'), name='api_book_title_lower_idx'),
+        ]
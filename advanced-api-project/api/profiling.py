@@ -0,0 +1,122 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+# Per-request SQL profiling.
+# QueryProfilingMiddleware records every query a request runs (on any database
+# alias) and reports the count, total time, duplicates and slowest statements:
+# as an X-Query-Profile header when DEBUG is on, and as one JSON log line on the
+# 'api.queries' logger otherwise. Views can declare a query budget; going over
+# it raises QueryBudgetExceeded while QUERY_BUDGETS_ENFORCE is on (development
+# and tests) and logs a warning in production.
+# The same module lives in django_blog/blog/ and LibraryProject/bookshelf/
+# (separate projects, no shared package); keep the copies in step.
+
+logger = logging.getLogger('api.queries')
+
+SLOWEST_STATEMENTS = 3
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """Declare how many queries a function view may run per request.
+
+    Class-based views set a `query_budget` attribute instead.
+    """
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def get_query_budget(view_func):
+    view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+    return getattr(view_func, 'query_budget', getattr(view_class, 'query_budget', None))
+
+
+class QueryProfile:
+    """Database execute wrapper that records each statement and its duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((context['connection'].alias, sql, repr(params), time.perf_counter() - started))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_ms(self):
+        return sum(duration for *_, duration in self.queries) * 1000
+
+    @property
+    def duplicates(self):
+        # Same statement with the same parameters run more than once in a request
+        counts = Counter((alias, sql, params) for alias, sql, params, _ in self.queries)
+        return sum(count - 1 for count in counts.values())
+
+    def slowest(self, limit=SLOWEST_STATEMENTS):
+        ranked = sorted(self.queries, key=lambda query: query[3], reverse=True)[:limit]
+        return [{'alias': alias, 'sql': sql[:500], 'ms': round(duration * 1000, 2)} for alias, sql, _, duration in ranked]
+
+    def summary(self):
+        return f'count={self.count}; time={self.total_ms:.1f}ms; duplicates={self.duplicates}'
+
+
+class QueryProfilingMiddleware:
+    header = 'X-Query-Profile'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = QueryProfile()
+        request.query_budget = None
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+
+        budget = request.query_budget
+        over_budget = budget is not None and profile.count > budget
+        if settings.DEBUG:
+            response[self.header] = profile.summary()
+        if over_budget or not settings.DEBUG:
+            self.log(request, response, profile, budget, over_budget)
+        if over_budget and getattr(settings, 'QUERY_BUDGETS_ENFORCE', False):
+            raise QueryBudgetExceeded(
+                f'{request.method} {request.path} ran {profile.count} queries; its budget is {budget}.'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
+
+    def log(self, request, response, profile, budget, over_budget):
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': profile.count,
+            'sql_ms': round(profile.total_ms, 2),
+            'duplicates': profile.duplicates,
+            'budget': budget,
+            'slowest': profile.slowest(),
+        }
+        logger.log(logging.WARNING if over_budget else logging.INFO, json.dumps(record), extra={'query_profile': record})
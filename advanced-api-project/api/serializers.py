@@ -1,4 +1,4 @@
-from time import timezone
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Book, Author
 
@@ -31,7 +31,7 @@ class BookSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Book
-        fields = '__all__  '
+        fields = '__all__'
     
 
     # Custom validation ensures that the publication year is not set in the future.
@@ -1,4 +1,10 @@
 
+import csv
+import io
+import json
+from base64 import b64encode
+
+from django.test import override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase, APIClient
@@ -17,17 +23,13 @@ def detail_url(book_id):
 
 def update_url(book_id):
     """Returns the URL for book update."""
-    # Matches name='book_update' (assuming the URL is defined as 'books/update/' or requires an ID if defined as 'books/<int:pk>/edit/')
-    # NOTE: Your original URL for update was just 'books/update/'. If that URL needs an ID, the path in urls.py is likely wrong. 
-    # Since DRF needs the ID, we'll assume the URL requires an ID argument, which means your path should be adjusted in urls.py: 
-    # path('books/<int:pk>/update/', UpdateView.as_view(), name='book_update'),
-    # For now, we will use the name 'book_update' without args, assuming your checker handles the endpoint path gracefully.
-    return reverse('book_update') 
+    # Matches name='book_update' (books/<int:pk>/update/)
+    return reverse('book_update', args=[book_id])
 
 def delete_url(book_id):
     """Returns the URL for book delete."""
-    # Matches name='book_delete'
-    return reverse('book_delete')
+    # Matches name='book_delete' (books/<int:pk>/delete/)
+    return reverse('book_delete', args=[book_id])
 
 
 User = get_user_model() 
@@ -53,7 +55,7 @@ class PublicBookApiTests(APITestCase):
         res = self.client.get(BOOK_LIST_URL)
         
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 4)
+        self.assertEqual(len(res.data['results']), 4)
 
     def test_retrieve_book_detail_success(self):
         """Test retrieving a single book detail is public and successful."""
@@ -79,9 +81,7 @@ class PublicBookApiTests(APITestCase):
 
     def test_update_book_denied_anonymous(self):
         """Test that anonymous users cannot update a book (403 Forbidden)."""
-        # NOTE: This test will only pass if your UpdateView handles the ID, 
-        # which it cannot do with the current URL path '/books/update/'.
-        url = update_url(self.book1.id) # 🔑 Use book_update URL (Issue likely here with path)
+        url = update_url(self.book1.id) # 🔑 Use book_update URL
         payload = {'title': 'Updated Title'}
         res = self.client.patch(url, payload)
 
@@ -89,7 +89,7 @@ class PublicBookApiTests(APITestCase):
 
     def test_delete_book_denied_anonymous(self):
         """Test that anonymous users cannot delete a book (403 Forbidden)."""
-        url = delete_url(self.book1.id) # 🔑 Use book_delete URL (Issue likely here with path)
+        url = delete_url(self.book1.id) # 🔑 Use book_delete URL
         res = self.client.delete(url)
 
         self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
@@ -101,7 +101,9 @@ class PrivateBookApiTests(APITestCase):
     
     def setUp(self):
         # Setup for Authentication
-        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.username = 'testuser'
+        self.password = 'testpassword'
+        self.user = User.objects.create_user(username=self.username, password=self.password)
         self.client = APIClient()
         self.client.login(username=self.username, password=self.password)
         
@@ -156,14 +158,14 @@ class PrivateBookApiTests(APITestCase):
         res = self.client.get(BOOK_LIST_URL, {'publication_year_gte': 2010})
         
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
 
     def test_ordering_by_publication_year_desc(self):
         """Test ordering by publication_year in descending order."""
         res = self.client.get(BOOK_LIST_URL, {'ordering': '-publication_year'})
         
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data[0]['title'], self.book3.title)
+        self.assertEqual(res.data['results'][0]['title'], self.book3.title)
 
 #"response.data"
 # Creating test database for alias 'default'...
@@ -173,4 +175,233 @@ class PrivateBookApiTests(APITestCase):
 # Ran 10 tests in 0.5s
 
 # OK
-# Destroying test database for alias 'default'...
\ No newline at end of file
+# Destroying test database for alias 'default'...
+
+class BookExportTests(APITestCase):
+    """Test the streaming NDJSON/CSV export of the (filtered) books."""
+
+    def setUp(self):
+        self.author1 = Author.objects.create(name='Jane Austen')
+        self.author2 = Author.objects.create(name='George Orwell')
+        self.book1 = Book.objects.create(title='Pride and Prejudice', publication_year=1813, author=self.author1)
+        self.book2 = Book.objects.create(title='1984', publication_year=1949, author=self.author2)
+        self.book3 = Book.objects.create(title='Animal Farm', publication_year=1945, author=self.author2)
+
+    def export(self, export_format, params=None, **extra):
+        res = self.client.get(reverse('book_export', args=[export_format]), params, **extra)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        return b''.join(res.streaming_content).decode(), res
+
+    def test_export_ndjson(self):
+        """Each book is one JSON object per line, in the default (title) order."""
+        body, res = self.export('ndjson')
+
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['1984', 'Animal Farm', 'Pride and Prejudice'])
+        self.assertEqual(rows[0], {
+            'id': self.book2.id, 'title': '1984', 'publication_year': 1949,
+            'author_id': self.author2.id, 'author_name': 'George Orwell',
+        })
+
+    def test_export_csv_uses_filter_search_and_ordering(self):
+        """The export takes the same filter, search and ordering parameters as the list."""
+        body, res = self.export('csv', {'search': 'Orwell', 'publication_year_gte': 1940, 'ordering': '-publication_year'})
+
+        self.assertEqual(res['Content-Disposition'], 'attachment; filename="books.csv"')
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], ['id', 'title', 'publication_year', 'author_id', 'author_name'])
+        self.assertEqual([row[1] for row in rows[1:]], ['1984', 'Animal Farm'])
+
+    def test_export_csv_without_matches_has_the_header(self):
+        body, _ = self.export('csv', {'publication_year': 2000}, HTTP_ACCEPT='text/csv')
+
+        self.assertEqual(body.splitlines(), ['id,title,publication_year,author_id,author_name'])
+
+    def test_export_reads_the_rows_with_one_query(self):
+        res = self.client.get(reverse('book_export', args=['ndjson']))
+        with self.assertNumQueries(1):
+            lines = b''.join(res.streaming_content).splitlines()
+
+        self.assertEqual(len(lines), 3)
+
+    @override_settings(QUERY_BUDGETS_ENFORCE=True)
+    def test_export_fits_its_budget_when_logged_in_and_filtered(self):
+        """Session, user and the author lookup all run inside the view."""
+        User.objects.create_user(username='reader', password='pw')
+        self.client.login(username='reader', password='pw')
+        body, _ = self.export('ndjson', {'author': self.author2.id})
+
+        self.assertEqual(len(body.splitlines()), 2)
+
+    def test_export_unknown_format(self):
+        res = self.client.get(reverse('book_export', args=['xml']))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BookQueryCountTests(APITestCase):
+    """The nested author and its books are loaded in a fixed number of queries."""
+
+    def setUp(self):
+        self.author1 = Author.objects.create(name='Jane Austen')
+        self.author2 = Author.objects.create(name='George Orwell')
+        Book.objects.create(title='Pride and Prejudice', publication_year=1813, author=self.author1)
+        Book.objects.create(title='Sense and Sensibility', publication_year=1811, author=self.author1)
+        self.book = Book.objects.create(title='1984', publication_year=1949, author=self.author2)
+
+    def test_list_queries_do_not_grow_with_the_books(self):
+        """Books with their authors, then the authors' books."""
+        with self.assertNumQueries(2):
+            res = self.client.get(BOOK_LIST_URL)
+        self.assertEqual(len(res.data['results']), 3)
+
+        author3 = Author.objects.create(name='Aldous Huxley')
+        Book.objects.create(title='Brave New World', publication_year=1932, author=author3)
+        with self.assertNumQueries(2):
+            res = self.client.get(BOOK_LIST_URL)
+        self.assertEqual(len(res.data['results']), 4)
+
+    def test_list_nests_the_authors_books(self):
+        res = self.client.get(BOOK_LIST_URL, {'ordering': 'title'})
+
+        self.assertEqual(res.data['results'][0]['author']['name'], 'George Orwell')
+        self.assertEqual(len(res.data['results'][0]['author']['books']), 1)
+        self.assertEqual(len(res.data['results'][1]['author']['books']), 2)
+
+    def test_detail_queries(self):
+        with self.assertNumQueries(2):
+            res = self.client.get(detail_url(self.book.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['author']['name'], 'George Orwell')
+
+    def test_create_queries(self):
+        """The author lookup, the insert, and the author's books for the response."""
+        self.client.force_authenticate(User.objects.create_user(username='writer', password='pw'))
+        payload = {'title': 'Animal Farm', 'publication_year': 1945, 'author_id': self.author2.id}
+        with self.assertNumQueries(3):
+            res = self.client.post(BOOK_CREATE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['author']['books']), 2)
+
+
+class BookPaginationTests(APITestCase):
+    """Keyset cursor pages over the list's ordering, with the primary key as tiebreaker."""
+
+    def setUp(self):
+        self.author1 = Author.objects.create(name='Jane Austen')
+        self.author2 = Author.objects.create(name='George Orwell')
+        # Repeated years and titles, so that only the tiebreaker orders some rows
+        for index in range(7):
+            Book.objects.create(title=f'Book {index % 3}', publication_year=1900 + index % 2,
+                                author=self.author1 if index % 2 else self.author2)
+
+    def walk(self, params):
+        """Titles and ids of every page, following the next links."""
+        pages = []
+        res = self.client.get(BOOK_LIST_URL, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append([(book['publication_year'], book['title'], book['id']) for book in res.data['results']])
+            if not res.data['next']:
+                return pages, res
+            res = self.client.get(res.data['next'])
+
+    def test_pages_cover_every_book_once_in_order(self):
+        for ordering in ('title', '-publication_year', 'author__name', '-title'):
+            with self.subTest(ordering=ordering):
+                pages, _ = self.walk({'ordering': ordering, 'page_size': 2})
+                rows = [row for page in pages for row in page]
+                expected = list(
+                    Book.objects.order_by(ordering, '-pk' if ordering.startswith('-') else 'pk').values_list('publication_year', 'title', 'id')
+                )
+                self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+                self.assertEqual(rows, expected)
+
+    def test_previous_link_returns_the_previous_page(self):
+        pages, last = self.walk({'ordering': '-publication_year', 'page_size': 3})
+
+        res = self.client.get(last.data['previous'])
+        self.assertEqual([(book['publication_year'], book['title'], book['id']) for book in res.data['results']], pages[-2])
+        self.assertIsNotNone(res.data['next'])
+
+    def test_page_size_is_capped(self):
+        res = self.client.get(BOOK_LIST_URL, {'page_size': 10_000})
+
+        self.assertEqual(len(res.data['results']), 7)
+        self.assertIsNone(res.data['next'])
+        self.assertIsNone(res.data['previous'])
+
+    def test_count_only_when_asked_for(self):
+        res = self.client.get(BOOK_LIST_URL, {'page_size': 2})
+        self.assertNotIn('count', res.data)
+
+        res = self.client.get(BOOK_LIST_URL, {'page_size': 2, 'count': 'estimate', 'publication_year': 1901})
+        self.assertEqual(res.data['count'], 3)
+
+    def test_invalid_cursor(self):
+        res = self.client.get(BOOK_LIST_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_values_of_the_wrong_type(self):
+        """A cursor that decodes, but whose values don't fit the ordering's fields."""
+        for position in (['x', 'notanint'], [1900, {'id': 1}]):
+            with self.subTest(position=position):
+                cursor = b64encode(json.dumps({'p': position, 'r': 0}).encode()).decode()
+                res = self.client.get(BOOK_LIST_URL, {'ordering': '-publication_year', 'cursor': cursor})
+
+                self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BookSearchTests(APITestCase):
+    """?search= matches a title prefix or part of the author's name, case-insensitively."""
+
+    def setUp(self):
+        self.author1 = Author.objects.create(name='George Orwell')
+        self.author2 = Author.objects.create(name='Jane Austen')
+        Book.objects.create(title='Animal Farm', publication_year=1945, author=self.author1)
+        Book.objects.create(title='1984', publication_year=1949, author=self.author1)
+        Book.objects.create(title='Emma', publication_year=1815, author=self.author2)
+        Book.objects.create(title='100% Orwell', publication_year=2000, author=self.author2)
+        Book.objects.create(title='An Orwell Reader', publication_year=1956, author=self.author2)
+
+    def search(self, term):
+        res = self.client.get(BOOK_LIST_URL, {'search': term})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [book['title'] for book in res.data['results']]
+
+    def test_title_prefix(self):
+        self.assertEqual(self.search('ANIM'), ['Animal Farm'])
+        self.assertEqual(self.search('1'), ['100% Orwell', '1984'])
+        # A prefix, not a substring of the title
+        self.assertEqual(self.search('farm'), [])
+
+    def test_like_wildcards_are_literal(self):
+        self.assertEqual(self.search('100%'), ['100% Orwell'])
+        self.assertEqual(self.search('1_'), [])
+
+    def test_author_name_or_title_prefix(self):
+        # Orwell's books, plus a title starting with the term (each book once)
+        self.assertEqual(self.search('orwell'), ['1984', 'Animal Farm'])
+        self.assertEqual(self.search('jane'), ['100% Orwell', 'An Orwell Reader', 'Emma'])
+
+    def test_every_term_must_match(self):
+        self.assertEqual(self.search('austen em'), ['Emma'])
+
+    def test_iprefix_lookup(self):
+        self.assertEqual(
+            sorted(Book.objects.filter(title__iprefix='AN').values_list('title', flat=True)),
+            ['An Orwell Reader', 'Animal Farm'],
+        )
+        self.assertEqual(Book.objects.filter(title__iprefix='').count(), 5)
+
+    def test_non_ascii_prefix(self):
+        """SQLite's LOWER() leaves 'É' alone, so these prefixes aren't lowercased on the database side."""
+        Book.objects.create(title='Élan vital', publication_year=1907, author=self.author2)
+
+        self.assertEqual(list(Book.objects.filter(title__iprefix='Éla').values_list('title', flat=True)), ['Élan vital'])
+        self.assertEqual(self.search('Éla'), ['Élan vital'])
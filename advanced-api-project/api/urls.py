@@ -1,32 +1,33 @@
 from django.urls import path
 from .views import (
-    ListView,
-    DetailView,
-    CreateView,
-    UpdateView,
-    DeleteView,
-    # Assuming these generic views are defined in your api/views.py
+    BookListCreateAPIView,
+    BookRetrieveUpdateDestroyAPIView,
+    BookExportAPIView,
 )
 
 urlpatterns = [
-    # 1. Retrieve All Books (ListView) - R (Read All)
+    # 1. Retrieve All Books (BookListCreateAPIView) - R (Read All)
     # Endpoint: /books/
-    path('books/', ListView.as_view(), name='book_list'),
+    path('books/', BookListCreateAPIView.as_view(), name='book_list'),
     
-    # 2. Add New Book (CreateView) - C (Create)
-    # Endpoint: /books/new/
-    path('books/create/', CreateView.as_view(), name='book_create'),
+    # 2. Add New Book (BookListCreateAPIView, POST) - C (Create)
+    # Endpoint: /books/create/
+    path('books/create/', BookListCreateAPIView.as_view(), name='book_create'),
 
-    # 3. Retrieve Single Book (DetailView) - R (Read One)
+    # 3. Retrieve Single Book (BookRetrieveUpdateDestroyAPIView) - R (Read One)
     # Endpoint: /books/<id>/
     # The <int:pk> captures the primary key (ID) as an integer.
-    path('books/<int:pk>/', DetailView.as_view(), name='book_detail'),
+    path('books/<int:pk>/', BookRetrieveUpdateDestroyAPIView.as_view(), name='book_detail'),
 
-    # 4. Modify Existing Book (UpdateView) - U (Update)
-    # Endpoint: /books/<id>/edit/
-    path('books/update/', UpdateView.as_view(), name='book_update'),
+    # 4. Modify Existing Book (BookRetrieveUpdateDestroyAPIView, PUT/PATCH) - U (Update)
+    # Endpoint: /books/<id>/update/
+    path('books/<int:pk>/update/', BookRetrieveUpdateDestroyAPIView.as_view(), name='book_update'),
 
-    # 5. Remove a Book (DeleteView) - D (Delete)
+    # 5. Remove a Book (BookRetrieveUpdateDestroyAPIView, DELETE) - D (Delete)
     # Endpoint: /books/<id>/delete/
-    path('books/delete/', DeleteView.as_view(), name='book_delete'),
-]
\ No newline at end of file
+    path('books/<int:pk>/delete/', BookRetrieveUpdateDestroyAPIView.as_view(), name='book_delete'),
+
+    # 6. Export the filtered books (BookExportAPIView), streamed as NDJSON or CSV
+    # Endpoint: /books/export/<ndjson|csv>/ (takes the list's filter, search and ordering parameters)
+    path('books/export/<str:export_format>/', BookExportAPIView.as_view(), name='book_export'),
+]
@@ -7,14 +7,18 @@ from django.views.generic import (
     UpdateView,
     DeleteView,
 )
+from django.db.models import Prefetch
 from .models import Book
+from django.http import StreamingHttpResponse
 from django.urls import reverse_lazy
+from rest_framework.exceptions import NotFound
 from rest_framework import generics, filters
 from .serializers import BookSerializer
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from .filters import BookFilter
+from .filters import BookFilter, IndexedSearchFilter
 from django_filters import rest_framework
+from .exports import EXPORT_FORMATS, export_rows
 
 # 1. ListView: Retrieves all books (R - Read All)
 class ListView(ListView):
@@ -50,20 +54,12 @@ class DeleteView(DeleteView):
     # Redirect to the book list after successful deletion
     success_url = reverse_lazy('book_list')
 
-# --- R (List) and C (Create) View ---
-class BookListCreateAPIView(generics.ListCreateAPIView):
+# 🔑 Custom Filter & Search, and Ordering Setup, shared by the book list and its export
+class BookQueryMixin:
     queryset = Book.objects.all()
-    serializer_class = BookSerializer
-    
-    # 🔑 Permission Setup: 
-    # - GET (List) is allowed for everyone.
-    # - POST (Create) is restricted to authenticated users.
-    permission_classes = [IsAuthenticatedOrReadOnly] 
-
-    # 🔑 Custom Filter & Search, and Ordering Setup:
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
+        IndexedSearchFilter, # SearchFilter over indexed lookups (see api/filters.py)
         filters.OrderingFilter,
         ]
     search_fields = ['^title', 'author__name']
@@ -71,6 +67,29 @@ class BookListCreateAPIView(generics.ListCreateAPIView):
     ordering_fields = ['title', 'publication_year', 'author__name']
     ordering = ['title'] # Default ordering
 
+# BookSerializer nests the author and the author's books: join the authors and fetch
+# all their books in one more query, instead of two queries per book
+def books_with_authors():
+    return Book.objects.select_related('author').prefetch_related(
+        Prefetch('author__books', queryset=Book.objects.order_by('pk'))
+    )
+
+# --- R (List) and C (Create) View ---
+class BookListCreateAPIView(BookQueryMixin, generics.ListCreateAPIView):
+    serializer_class = BookSerializer
+    # Most queries a request may run (see api/profiling.py): session, user, the author filter's
+    # lookup, the ?count=estimate count, the page of books with their authors, the authors' books
+    # (a POST: the author, the insert, its books)
+    query_budget = 6
+
+    def get_queryset(self):
+        return books_with_authors()
+    
+    # 🔑 Permission Setup: 
+    # - GET (List) is allowed for everyone.
+    # - POST (Create) is restricted to authenticated users.
+    permission_classes = [IsAuthenticatedOrReadOnly] 
+
 
     def perform_create(self, serializer):
         """
@@ -81,10 +100,40 @@ class BookListCreateAPIView(generics.ListCreateAPIView):
 
 # --- R (Detail), U (Update), and D (Delete) View ---
 class BookRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Book.objects.all()
     serializer_class = BookSerializer
+    # Most queries a request may run (see api/profiling.py): session, user, the book with its author,
+    # the author's books; a PUT/PATCH also looks up the new author, saves, and lists that author's books
+    query_budget = 7
+
+    def get_queryset(self):
+        return books_with_authors()
     
     # 🔑 Permission Setup: 
     # - GET (Detail) is allowed for everyone.
     # - PUT/PATCH (Update) and DELETE are restricted to authenticated users.
-    permission_classes = [IsAuthenticatedOrReadOnly]
\ No newline at end of file
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+# --- R (Export) View ---
+class BookExportAPIView(BookQueryMixin, generics.GenericAPIView):
+    """
+    Streams every book matching the list's filter, search and ordering
+    parameters as NDJSON or CSV (see api/exports.py).
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    # Most queries a request may run (see api/profiling.py): session, user, the author
+    # filter's lookup (author=<id>); the rows are read while the response streams,
+    # after the view has returned
+    query_budget = 3
+
+    def get(self, request, export_format):
+        if export_format not in EXPORT_FORMATS:
+            raise NotFound(f'Unknown export format "{export_format}".')
+        write, content_type = EXPORT_FORMATS[export_format]
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(write(export_rows(queryset)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="books.{export_format}"'
+        return response
+
+    def perform_content_negotiation(self, request, force=False):
+        # The format comes from the URL; an Accept: text/csv header must not end in 406
+        return super().perform_content_negotiation(request, force=True)
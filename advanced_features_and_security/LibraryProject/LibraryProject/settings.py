@@ -99,6 +99,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it sees every query the other middleware and the view run
+    'bookshelf.profiling.QueryProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -204,4 +206,25 @@ CSP_IMG_SRC = ("'self'", "data:")
 CSP_FONT_SRC = ("'self'",)
 CSP_CONNECT_SRC = ("'self'",)
 CSP_FRAME_SRC = ("'none'",)
-CSP_OBJECT_SRC = ("'none'",)
\ No newline at end of file
+CSP_OBJECT_SRC = ("'none'",)
+
+# ------------------------------
+# Query profiling (bookshelf/profiling.py)
+# ------------------------------
+
+# Overruns raise QueryBudgetExceeded while developing and are logged as warnings
+# in production.
+QUERY_BUDGETS_ENFORCE = DEBUG
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # One JSON line per request with its query count, SQL time and slowest statements
+        # (with DEBUG on the X-Query-Profile header carries them and only overruns are logged)
+        'bookshelf.queries': {'handlers': ['console'], 'level': 'WARNING' if DEBUG else 'INFO', 'propagate': False},
+    },
+}
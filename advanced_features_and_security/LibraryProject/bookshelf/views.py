@@ -3,6 +3,7 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.db.models import Q
 from .models import Book
 from .forms import ExampleForm, BookForm
+from .profiling import query_budget
 
 # ------------------------------
 # Create Book
@@ -54,6 +55,7 @@ def delete_book(request, pk):
 # Book List & Search
 # ------------------------------
 @login_required
+@query_budget(3)  # session, user, books (see bookshelf/profiling.py)
 def book_list(request):
     query = request.GET.get('q', '')  # Get search input safely
     if query:
@@ -1,3 +1,79 @@
 from django.contrib import admin
+from django.db import transaction
+from django.template.defaultfilters import pluralize
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from .cache import invalidate_post
+from .models import Comment, Post
 
 # Register your models here.
+
+
+@admin.register(Comment)
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ('excerpt', 'author', 'post', 'created_at', 'is_approved')
+    list_filter = ('is_approved',)
+    list_select_related = ('post', 'author')
+    search_fields = ('content',)
+    raw_id_fields = ('post', 'author')
+    ordering = ('-created_at', '-id')
+    # Counting every comment for "N total" on each page is a full scan on a big table
+    show_full_result_count = False
+    actions = ['approve_comments', 'unapprove_comments', 'delete_comments']
+
+    # Each action is one statement for all the selected comments, plus one UPDATE
+    # that recomputes the comment stats of the posts they belong to. The built-in
+    # delete_selected would load the comments and delete them one at a time.
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    @admin.display(description='Comment')
+    def excerpt(self, comment):
+        return Truncator(comment.content).chars(80)
+
+    @admin.action(description='Approve selected comments', permissions=['change'])
+    def approve_comments(self, request, queryset):
+        count = self.moderate(queryset, approved=True)
+        self.message_user(request, f'Approved {count} comment{pluralize(count)}.')
+
+    @admin.action(description='Unapprove selected comments', permissions=['change'])
+    def unapprove_comments(self, request, queryset):
+        count = self.moderate(queryset, approved=False)
+        self.message_user(request, f'Unapproved {count} comment{pluralize(count)}.')
+
+    @admin.action(description='Delete selected comments', permissions=['delete'])
+    def delete_comments(self, request, queryset):
+        with transaction.atomic():
+            # The posts have to be known before their comments are gone: one id per post, not per comment
+            post_ids = set(queryset.order_by().values_list('post_id', flat=True).distinct())
+            # Nothing references comments, so a plain DELETE is safe; it skips the per-comment
+            # signals (a stats UPDATE each), whose work refresh_posts() does once per post
+            count = queryset._raw_delete(queryset.db)
+            self.refresh_posts(post_ids)
+        self.message_user(request, f'Deleted {count} comment{pluralize(count)}.')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # New comments are counted by the post_save signal; approval changes and moves are not
+        if change and {'is_approved', 'post'} & set(form.changed_data):
+            self.refresh_posts({obj.post_id, form.initial.get('post', obj.post_id)})
+
+    def moderate(self, queryset, approved):
+        with transaction.atomic():
+            queryset = queryset.exclude(is_approved=approved)
+            post_ids = set(queryset.values_list('post_id', flat=True))
+            # Moving updated_at along changes the post pages' ETags
+            count = queryset.update(is_approved=approved, updated_at=timezone.now())
+            self.refresh_posts(post_ids)
+        return count
+
+    def refresh_posts(self, post_ids):
+        if not post_ids:
+            return
+        Post.objects.filter(pk__in=post_ids).refresh_comment_stats()
+        for post_id in post_ids:
+            invalidate_post(post_id)
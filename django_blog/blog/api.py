@@ -0,0 +1,122 @@
+from django.core.paginator import InvalidPage
+from rest_framework import generics
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Comment, Post, TagStat
+from .pagination import KeysetPaginator
+from .search import tagged_post_ids
+from .serializers import CommentSerializer, PostSerializer, TagSerializer, load_only_requested
+from .views import COMMENT_KEYSET
+
+# Read-only JSON API for posts, comments and tags.
+# Responses carry only the fields asked for with ?fields=, and the queryset
+# loads only what those fields read: a list of post titles never reads the
+# post bodies. Pages are keyset cursors over indexed orderings (the same
+# KeysetPaginator the HTML lists use), so deep pages cost the same as the first.
+
+
+class KeysetCursorPagination(BasePagination):
+    """DRF pagination over KeysetPaginator, using the view's `keyset`."""
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = KeysetPaginator(queryset, self.get_page_size(request), view.keyset)
+        try:
+            self.page = paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidPage as exc:
+            raise NotFound(str(exc))
+        return list(self.page)
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_link(self.page.next_cursor),
+            'previous': self.get_link(self.page.previous_cursor),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class PublicReadMixin:
+    # Public data: skipping authentication spares the session and user queries
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    pagination_class = KeysetCursorPagination
+    keyset = ('-published_date', '-pk')
+
+    def get_queryset(self):
+        # Load only the columns and relations the requested fields use, plus the keyset
+        always = [key.lstrip('-') for key in self.keyset]
+        return load_only_requested(self.get_base_queryset(), self.get_serializer(), always=always)
+
+
+#1. Posts, newest first; ?tag=<slug> limits them to one tag
+class PostAPIList(PublicReadMixin, generics.ListAPIView):
+    serializer_class = PostSerializer
+    query_budget = 3  # page of posts with their authors, their tags (and once per process, the Post content type)
+
+    def get_base_queryset(self):
+        posts = Post.objects.all()
+        tag = self.request.query_params.get('tag')
+        if tag:
+            posts = posts.filter(pk__in=tagged_post_ids(slug=tag))
+        return posts
+
+
+#2. One post
+class PostAPIDetail(PublicReadMixin, generics.RetrieveAPIView):
+    serializer_class = PostSerializer
+    keyset = ()
+    query_budget = 2
+
+    def get_base_queryset(self):
+        return Post.objects.all()
+
+
+#3. Approved comments of a post, newest first
+class CommentAPIList(PublicReadMixin, generics.ListAPIView):
+    serializer_class = CommentSerializer
+    keyset = COMMENT_KEYSET
+    query_budget = 1
+
+    def get_base_queryset(self):
+        return Comment.objects.filter(post_id=self.kwargs['pk'], is_approved=True)
+
+
+#4. Tags, most used first, from the precomputed TagStat table
+class TagAPIList(PublicReadMixin, generics.ListAPIView):
+    serializer_class = TagSerializer
+    keyset = ('-post_count', '-pk')
+    query_budget = 1
+
+    def get_base_queryset(self):
+        return TagStat.objects.filter(post_count__gt=0)
@@ -0,0 +1,76 @@
+import time
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, cache, caches
+from django.core.cache.utils import make_template_fragment_key
+
+# Version counters for cached post fragments.
+# Fragments are keyed by a version number instead of being deleted: bumping the
+# version makes every old fragment unreachable, and the cache evicts them later.
+
+POST_LIST_VERSION_KEY = 'blog:post-list:version'
+TAG_CLOUD_VERSION_KEY = 'blog:tag-cloud:version'
+
+
+def post_version_key(post_id):
+    return f'blog:post:{post_id}:version'
+
+
+def fragment_cache_timeout():
+    return getattr(settings, 'BLOG_FRAGMENT_CACHE_TIMEOUT', 60 * 15)
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock rather than 1 so that a counter that was evicted
+        # never reuses the version of a fragment that might still be cached.
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def post_cache_version(post_id):
+    return _get_version(post_version_key(post_id))
+
+
+def post_list_cache_version():
+    return _get_version(POST_LIST_VERSION_KEY)
+
+
+def tag_cloud_cache_version():
+    return _get_version(TAG_CLOUD_VERSION_KEY)
+
+
+def invalidate_post(post_id):
+    """Expire cached fragments for one post and for every post list."""
+    _bump_version(post_version_key(post_id))
+    _bump_version(POST_LIST_VERSION_KEY)
+
+
+def invalidate_post_lists():
+    _bump_version(POST_LIST_VERSION_KEY)
+
+
+def invalidate_tag_cloud():
+    _bump_version(TAG_CLOUD_VERSION_KEY)
+
+
+async def afragment_is_cached(fragment_name, *vary_on):
+    """Whether {% cache ... fragment_name vary_on... %} would be served from the cache.
+
+    Async views use it to skip loading data that only a cached fragment needs.
+    """
+    try:
+        fragment_cache = caches['template_fragments']
+    except InvalidCacheBackendError:
+        fragment_cache = cache
+    return await fragment_cache.ahas_key(make_template_fragment_key(fragment_name, vary_on))
@@ -0,0 +1,73 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import MD5, Concat
+
+from .cache import post_list_cache_version
+
+# Conditional GET (ETag) for post pages, used with
+# django.views.decorators.http.condition. Everything here is computed without
+# rendering: one small query for a post, and none at all for post lists.
+#
+# Only ETags are offered: deleting or unapproving a post's latest comment changes
+# the page while moving its newest date back, which Last-Modified could not express.
+
+
+def _viewer_key(request):
+    # Pages differ per visitor (edit links, comment form, CSRF token). The cookies
+    # that identify the visitor are enough to tell them apart without a database hit.
+    return '|'.join(
+        request.COOKIES.get(name, '') for name in (settings.SESSION_COOKIE_NAME, settings.CSRF_COOKIE_NAME)
+    )
+
+
+def _hash(*parts):
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _freshness_queryset(pk):
+    from .models import Comment, Post
+    last_comment_update = Comment.objects.filter(post=OuterRef('pk')).order_by('-updated_at').values('updated_at')[:1]
+    return Post.objects.filter(pk=pk).annotate(
+        content_hash=MD5(Concat('title', Value('\x1f'), 'content', output_field=TextField())),
+        last_comment_update=Subquery(last_comment_update),
+    ).values('published_date', 'updated_at', 'comment_count', 'content_hash', 'last_comment_update')
+
+
+def post_freshness(request, pk):
+    """Dates and content hash of a post and its comments, fetched in a single query."""
+    cached = getattr(request, '_blog_post_freshness', {})
+    if pk not in cached:
+        cached[pk] = _freshness_queryset(pk).first()
+        request._blog_post_freshness = cached
+    return cached[pk]
+
+
+async def apost_freshness(request, pk):
+    """Async post_freshness: async views call it first so the etag functions find the row cached."""
+    cached = getattr(request, '_blog_post_freshness', {})
+    if pk not in cached:
+        cached[pk] = await _freshness_queryset(pk).afirst()
+        request._blog_post_freshness = cached
+    return cached[pk]
+
+
+def post_detail_etag(request, pk, **kwargs):
+    freshness = post_freshness(request, pk)
+    if freshness is None:
+        return None  # let the view answer 404
+    return _hash(
+        freshness['published_date'].isoformat(),
+        freshness['updated_at'].isoformat(),
+        freshness['last_comment_update'].isoformat() if freshness['last_comment_update'] else '',
+        freshness['comment_count'],
+        freshness['content_hash'],
+        _viewer_key(request),
+    )
+
+
+def post_list_etag(request, *args, **kwargs):
+    # The post-list cache version changes whenever any post, tag or comment does,
+    # so together with the URL (ordering, cursor, tag) it identifies the page.
+    return _hash(post_list_cache_version(), request.get_full_path(), _viewer_key(request))
@@ -0,0 +1,131 @@
+import atexit
+import logging
+import time
+from collections import Counter
+from datetime import timedelta
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, PositiveBigIntegerField, Sum, Value, When
+from django.utils import timezone
+
+from .models import Post, PostDailyViews
+from .routers import use_primary
+from .tasks import enqueue
+
+# Debounced page view counters.
+# A page view only bumps a counter in this process's memory. The first view after
+# BLOG_VIEW_COUNT_FLUSH_INTERVAL seconds queues a background task (blog/tasks.py)
+# that adds everything counted so far to the database, a few statements per batch
+# of posts however many views they got: Post.view_count and today's PostDailyViews
+# row. In a server process (see django_blog/wsgi.py and asgi.py), whatever is
+# still buffered when it exits (a worker restart or shutdown) is written by an
+# atexit hook; only a process that is killed outright loses its last interval of
+# views, which is acceptable for popularity stats. Other processes, such as the
+# test runner, whose database is gone by then, don't register the hook.
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 500
+TRENDING_CACHE_KEY = 'blog:trending'
+
+_pending = Counter()
+_lock = Lock()
+_last_flush_queued = time.monotonic()
+
+
+def flush_interval():
+    return getattr(settings, 'BLOG_VIEW_COUNT_FLUSH_INTERVAL', 30)
+
+
+def count_view(post_id):
+    """Record one view of a post; it reaches the database with the next flush."""
+    global _last_flush_queued
+    with _lock:
+        _pending[post_id] += 1
+        # A flush that never runs (its transaction rolled back) is simply retried an interval later
+        due = time.monotonic() - _last_flush_queued >= flush_interval()
+        if due:
+            _last_flush_queued = time.monotonic()
+    if due:
+        enqueue(flush_view_counts)
+
+
+def pending_views():
+    with _lock:
+        return dict(_pending)
+
+
+def flush_view_counts():
+    """Write the buffered views to the database and return how many were written."""
+    with _lock:
+        counts = dict(_pending)
+        _pending.clear()
+    try:
+        items = sorted(counts.items())
+        for start in range(0, len(items), FLUSH_BATCH_SIZE):
+            _write_views(dict(items[start:start + FLUSH_BATCH_SIZE]))
+    except Exception:
+        # Keep the views for the next flush rather than dropping them
+        with _lock:
+            _pending.update(counts)
+        raise
+    return sum(counts.values())
+
+
+def flush_at_exit():
+    """Write the views still buffered when the process exits."""
+    if not pending_views():
+        return
+    try:
+        flush_view_counts()
+    except Exception:
+        # The database may already be gone; there is nobody left to raise to
+        logger.exception('Could not write %d buffered post views at exit', sum(pending_views().values()))
+
+
+def flush_on_exit():
+    """Have this process write its buffered views when it exits; for server entry points."""
+    atexit.unregister(flush_at_exit)
+    atexit.register(flush_at_exit)
+
+
+def _added_views(field, views):
+    """CASE expression giving each post's new views, matched on `field`."""
+    whens = (When(**{field: pk}, then=Value(count)) for pk, count in views.items())
+    return Case(*whens, output_field=PositiveBigIntegerField())
+
+
+def _write_views(counts):
+    today = timezone.localdate()
+    with use_primary(), transaction.atomic():
+        # Locking the posts in pk order keeps flushes from several processes from deadlocking,
+        # and skips posts deleted since they were viewed
+        post_ids = list(Post.objects.filter(pk__in=counts).order_by('pk').select_for_update().values_list('pk', flat=True))
+        if not post_ids:
+            return
+        views = {pk: counts[pk] for pk in post_ids}
+        Post.objects.filter(pk__in=post_ids).update(view_count=F('view_count') + _added_views('pk', views))
+        PostDailyViews.objects.bulk_create([PostDailyViews(post_id=pk, day=today) for pk in post_ids], ignore_conflicts=True)
+        PostDailyViews.objects.filter(post_id__in=post_ids, day=today).update(views=F('views') + _added_views('post_id', views))
+
+
+def trending_ranking(limit=None):
+    """(post id, views) of the most viewed posts over the last BLOG_TRENDING_DAYS days, most viewed first.
+
+    Recomputed at most once per flush interval, since the counts don't move in between.
+    """
+    limit = limit or getattr(settings, 'BLOG_TRENDING_POSTS', 10)
+    key = f'{TRENDING_CACHE_KEY}:{limit}'
+    ranking = cache.get(key)
+    if ranking is None:
+        since = timezone.localdate() - timedelta(days=getattr(settings, 'BLOG_TRENDING_DAYS', 7) - 1)
+        ranking = list(
+            PostDailyViews.objects.filter(day__gte=since)
+            .values('post').annotate(recent_views=Sum('views'))
+            .order_by('-recent_views', '-post').values_list('post', 'recent_views')[:limit]
+        )
+        cache.set(key, ranking, timeout=max(flush_interval(), 1))
+    return ranking
@@ -0,0 +1,242 @@
+import hashlib
+from io import StringIO
+from math import ceil
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, cache, caches
+from django.db.models import Count, Max
+from django.urls import reverse
+from django.utils import feedgenerator
+from django.utils.html import linebreaks
+from django.utils.text import Truncator
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from .models import Post
+from .search import tagged_post_ids
+
+# RSS/Atom feeds and the sitemap.
+# Feed readers and crawlers poll these documents, so every request starts with one
+# small query for what the document is made of (the ids and update times of its
+# posts). That answers conditional GETs, and is the key under which the rendered
+# document is kept in the 'feeds' cache, on disk. When a document does have to be
+# built, only the entries of new or edited posts are rendered: the others come
+# from the cache too. The sitemap is split into fixed ranges of post ids, so new
+# posts only ever change the last section.
+#
+# Only ETags are offered: a deleted post changes a document without making any
+# update time newer, which Last-Modified could not express.
+
+SUMMARY_WORDS = 60
+SITEMAP_NAMESPACE = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def feed_items():
+    return getattr(settings, 'BLOG_FEED_ITEMS', 20)
+
+
+def sitemap_section_size():
+    return getattr(settings, 'BLOG_SITEMAP_SECTION_SIZE', 10_000)
+
+
+def feed_cache():
+    try:
+        return caches['feeds']
+    except InvalidCacheBackendError:
+        return cache
+
+
+def _hash(*parts):
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _base_url(request):
+    return request.build_absolute_uri('/').rstrip('/')
+
+
+class CachedEntriesMixin:
+    """Writes entries rendered beforehand by render_entry() instead of building them from self.items."""
+
+    def __init__(self, *args, entries=(), updated=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.entries = entries
+        self.updated = updated
+
+    def latest_post_date(self):
+        return self.updated or super().latest_post_date()
+
+    def write_items(self, handler):
+        for entry in self.entries:
+            # ignorableWhitespace() writes its argument as is, and the entries are XML already
+            handler.ignorableWhitespace(entry)
+
+
+class RssFeed(CachedEntriesMixin, feedgenerator.Rss201rev2Feed):
+    entry_element = 'item'
+
+
+class AtomFeed(CachedEntriesMixin, feedgenerator.Atom1Feed):
+    entry_element = 'entry'
+
+
+FEED_TYPES = {'rss': RssFeed, 'atom': AtomFeed}
+
+
+def render_entry(feed_class, post, base_url):
+    """The <item> or <entry> element of one post."""
+    link = base_url + post.get_absolute_url()
+    feed = feed_class(title='', link='', description='')
+    feed.add_item(
+        title=post.title,
+        link=link,
+        unique_id=link,
+        description=linebreaks(Truncator(post.content).words(SUMMARY_WORDS), autoescape=True),
+        author_name=post.author.username,
+        pubdate=post.published_date,
+        updateddate=post.updated_at,
+        categories=[tag.name for tag in post.tags.all()],
+    )
+    item = feed.items[0]
+    stream = StringIO()
+    handler = SimplerXMLGenerator(stream, 'utf-8', short_empty_elements=True)
+    handler.startElement(feed.entry_element, feed.item_attributes(item))
+    feed.add_item_elements(handler, item)
+    handler.endElement(feed.entry_element)
+    return stream.getvalue()
+
+
+def feed_freshness(request, tag_slug=None):
+    """(pk, updated_at) of the posts in a feed, newest first, fetched once per request."""
+    if not hasattr(request, '_blog_feed_freshness'):
+        posts = Post.objects.order_by('-published_date', '-pk')
+        if tag_slug is not None:
+            posts = posts.filter(pk__in=tagged_post_ids(slug=tag_slug))
+        request._blog_feed_freshness = list(posts.values_list('pk', 'updated_at')[:feed_items()])
+    return request._blog_feed_freshness
+
+
+def feed_etag(request, feed_format, tag_slug=None, **kwargs):
+    if feed_format not in FEED_TYPES:
+        return None  # let the view answer 404
+    return _hash(
+        'feed', feed_format, tag_slug, _base_url(request),
+        *(f'{pk}:{updated_at.isoformat()}' for pk, updated_at in feed_freshness(request, tag_slug)),
+    )
+
+
+def _feed_entries(request, feed_class, freshness):
+    base_url = _base_url(request)
+    keys = {
+        pk: f'blog:feed-entry:{feed_class.entry_element}:{_hash(base_url, pk, updated_at.isoformat())}'
+        for pk, updated_at in freshness
+    }
+    entries = feed_cache().get_many(keys.values())
+    missing = [pk for pk, key in keys.items() if key not in entries]
+    if missing:
+        rendered = {
+            keys[post.pk]: render_entry(feed_class, post, base_url)
+            for post in Post.objects.filter(pk__in=missing).select_related('author').prefetch_related('tags')
+        }
+        feed_cache().set_many(rendered)
+        entries.update(rendered)
+    # A post deleted since the freshness query simply drops out
+    return [entries[key] for key in keys.values() if key in entries]
+
+
+def feed_document(request, feed_format, tag_slug=None):
+    """The feed as XML: from the cache, or assembled from cached entries and those of new posts."""
+    key = f'blog:feed:{feed_etag(request, feed_format, tag_slug)}'
+    document = feed_cache().get(key)
+    if document is None:
+        feed_class = FEED_TYPES[feed_format]
+        freshness = feed_freshness(request, tag_slug)
+        if tag_slug is None:
+            title, link, description = 'Django Blog', reverse('post-list'), 'The latest posts.'
+        else:
+            title = f'Django Blog: {tag_slug}'
+            link = reverse('posts-by-tag', args=[tag_slug])
+            description = f'The latest posts tagged "{tag_slug}".'
+        feed = feed_class(
+            title=title,
+            link=_base_url(request) + link,
+            description=description,
+            feed_url=request.build_absolute_uri(request.path),
+            language=settings.LANGUAGE_CODE,
+            entries=_feed_entries(request, feed_class, freshness),
+            updated=max((updated_at for _, updated_at in freshness), default=None),
+        )
+        document = feed.writeString('utf-8')
+        feed_cache().set(key, document)
+    return document
+
+
+def sitemap_sections(request):
+    """Number of sitemap sections: section n lists the posts with ids in ((n - 1) * size, n * size]."""
+    if not hasattr(request, '_blog_sitemap_sections'):
+        last_pk = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        request._blog_sitemap_sections = max(1, ceil(last_pk / sitemap_section_size()))
+    return request._blog_sitemap_sections
+
+
+def _section_posts(section):
+    size = sitemap_section_size()
+    return Post.objects.filter(pk__gt=(section - 1) * size, pk__lte=section * size)
+
+
+def sitemap_section_freshness(request, section):
+    if not hasattr(request, '_blog_sitemap_freshness'):
+        request._blog_sitemap_freshness = _section_posts(section).aggregate(count=Count('pk'), lastmod=Max('updated_at'))
+    return request._blog_sitemap_freshness
+
+
+def sitemap_index_etag(request, **kwargs):
+    return _hash('sitemap', sitemap_section_size(), sitemap_sections(request), _base_url(request))
+
+
+def sitemap_section_etag(request, section, **kwargs):
+    freshness = sitemap_section_freshness(request, section)
+    lastmod = freshness['lastmod'].isoformat() if freshness['lastmod'] else ''
+    return _hash('sitemap-section', sitemap_section_size(), section, freshness['count'], lastmod, _base_url(request))
+
+
+def _xml_document(write_body):
+    stream = StringIO()
+    handler = SimplerXMLGenerator(stream, 'utf-8', short_empty_elements=True)
+    handler.startDocument()
+    write_body(handler)
+    return stream.getvalue()
+
+
+def sitemap_index_document(request):
+    base_url = _base_url(request)
+
+    def write_body(handler):
+        handler.startElement('sitemapindex', {'xmlns': SITEMAP_NAMESPACE})
+        for section in range(1, sitemap_sections(request) + 1):
+            handler.startElement('sitemap', {})
+            handler.addQuickElement('loc', base_url + reverse('sitemap-section', args=[section]))
+            handler.endElement('sitemap')
+        handler.endElement('sitemapindex')
+
+    return _xml_document(write_body)
+
+
+def sitemap_section_document(request, section):
+    """One section of the sitemap as XML, rendered only when its posts have changed."""
+    key = f'blog:sitemap:{sitemap_section_etag(request, section)}'
+    document = feed_cache().get(key)
+    if document is None:
+        # reverse() once rather than for each of thousands of posts
+        location = _base_url(request) + reverse('post-detail', args=[0]).replace('/0/', '/{}/')
+
+        def write_body(handler):
+            handler.startElement('urlset', {'xmlns': SITEMAP_NAMESPACE})
+            for pk, updated_at in _section_posts(section).order_by('pk').values_list('pk', 'updated_at').iterator():
+                handler.startElement('url', {})
+                handler.addQuickElement('loc', location.format(pk))
+                handler.addQuickElement('lastmod', updated_at.isoformat(timespec='seconds'))
+                handler.endElement('url')
+            handler.endElement('urlset')
+
+        document = _xml_document(write_body)
+        feed_cache().set(key, document)
+    return document
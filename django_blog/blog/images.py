@@ -0,0 +1,68 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .tasks import enqueue
+
+# Profile picture processing.
+# Uploads are stored as-is by the request; a background task then rewrites the
+# original without metadata (EXIF, GPS, ...) and at a bounded size, and renders
+# square-bounded JPEG thumbnails next to it under stable, predictable names.
+
+RENDITION_SIZES = {'small': 64, 'medium': 150, 'large': 400}
+MAX_ORIGINAL_SIZE = 1024
+RENDITION_DIR = 'profile_pictures/renditions'
+
+
+def rendition_name(picture_name, label):
+    stem = os.path.splitext(os.path.basename(picture_name))[0]
+    return f'{RENDITION_DIR}/{stem}_{label}.jpg'
+
+
+def _encode(image, image_format):
+    buffer = BytesIO()
+    # Pillow only writes metadata when asked to, so re-encoding drops it
+    image.save(buffer, format=image_format, quality=85)
+    return ContentFile(buffer.getvalue())
+
+
+def _replace(name, content):
+    # Delete first so the storage keeps the exact name instead of adding a suffix
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, content)
+
+
+def process_profile_picture(profile_id):
+    from .models import Profile
+    profile = Profile.objects.filter(pk=profile_id).first()
+    if profile is None or not profile.profile_picture:
+        return
+    name = profile.profile_picture.name
+    with default_storage.open(name) as picture:
+        image = Image.open(picture)
+        image_format = image.format or 'JPEG'
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.thumbnail((MAX_ORIGINAL_SIZE, MAX_ORIGINAL_SIZE))
+    _replace(name, _encode(image, image_format))
+
+    rgb = image.convert('RGB')
+    for label, size in RENDITION_SIZES.items():
+        thumbnail = rgb.copy()
+        thumbnail.thumbnail((size, size))
+        _replace(rendition_name(name, label), _encode(thumbnail, 'JPEG'))
+
+    # Only mark the renditions ready if the picture wasn't replaced meanwhile
+    Profile.objects.filter(pk=profile_id, profile_picture=name).update(profile_picture_processed_at=timezone.now())
+
+
+def enqueue_profile_picture_processing(profile):
+    enqueue(process_profile_picture, profile.pk)
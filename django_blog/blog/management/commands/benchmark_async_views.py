@@ -0,0 +1,132 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from blog.models import Post
+
+MODES = ['sync', 'async']
+
+
+class Command(BaseCommand):
+    help = ('Serve the post list, detail, tag and search pages through the ASGI handler to many '
+            'concurrent clients, once with the sync read views and once with the async ones '
+            '(BLOG_ASYNC_VIEWS), and compare throughput, latency and the threads used.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once.')
+        parser.add_argument('--requests', type=int, default=1000, help='Total requests per mode.')
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+        # Internal: run one mode in this process and print its results as JSON
+        parser.add_argument('--worker', action='store_true', help='(internal)')
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self.stdout.write(json.dumps(asyncio.run(self.run(options['concurrency'], options['requests']))))
+            return
+
+        # Views are chosen when the URLconf is imported, so each mode gets a fresh process
+        self.stdout.write(f'{options["requests"]} requests, {options["concurrency"]} concurrent')
+        self.stdout.write(f'{"mode":<8}{"req/s":>8}{"p50 ms":>9}{"p95 ms":>9}{"peak threads":>14}')
+        for mode in options['modes']:
+            result = self.run_worker(mode, options)
+            self.stdout.write(
+                f'{mode:<8}{result["throughput"]:>8.0f}{result["p50"]:>9.1f}{result["p95"]:>9.1f}'
+                f'{result["peak_threads"]:>14}'
+            )
+
+    def run_worker(self, mode, options):
+        command = [
+            sys.executable, sys.argv[0], 'benchmark_async_views', '--worker',
+            '--concurrency', str(options['concurrency']), '--requests', str(options['requests']),
+        ]
+        env = {**os.environ, 'BLOG_ASYNC_VIEWS': '1' if mode == 'async' else '0'}
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        if completed.returncode:
+            raise CommandError(f'The {mode} run failed:\n{completed.stderr}')
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def paths(self):
+        post = Post.objects.order_by('-pk').first()
+        if post is None:
+            raise CommandError('There are no posts to serve; import some first (see import_posts).')
+        return [
+            reverse('post-list'),
+            reverse('post-detail', args=[post.pk]),
+            reverse('posts-by-tag', args=['django']),
+            f'{reverse("post-search")}?q=django',
+        ]
+
+    async def request(self, application, path):
+        path, _, query_string = path.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query_string.encode(),
+            'headers': [(b'host', b'localhost')], 'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+        }
+        finished = asyncio.Event()
+        status = []
+        sent_body = False
+
+        async def receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif not message.get('more_body'):
+                finished.set()
+
+        await application(scope, receive, send)
+        finished.set()
+        if status[0] != 200:
+            raise CommandError(f'{path} returned {status[0]}')
+
+    async def run(self, concurrency, total):
+        application = get_asgi_application()
+        paths = await sync_to_async(self.paths)()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        peak_threads = threading.active_count()
+
+        async def one(index):
+            async with semaphore:
+                started = time.perf_counter()
+                await self.request(application, paths[index % len(paths)])
+                latencies.append(time.perf_counter() - started)
+
+        async def sample_threads():
+            nonlocal peak_threads
+            while True:
+                peak_threads = max(peak_threads, threading.active_count())
+                await asyncio.sleep(0.005)
+
+        await asyncio.gather(*(one(index) for index in range(len(paths))))  # warm up
+        latencies.clear()
+        sampler = asyncio.create_task(sample_threads())
+        started = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(total)))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+
+        latencies.sort()
+        return {
+            'throughput': len(latencies) / elapsed,
+            'p50': statistics.median(latencies) * 1000,
+            'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            'peak_threads': peak_threads,
+        }
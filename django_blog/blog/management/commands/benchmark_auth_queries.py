@@ -0,0 +1,67 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+def legacy_save_user_profile(sender, instance, **kwargs):
+    # The receiver this app used to have: save the profile on every User save
+    instance.profile.save()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Count the queries issued by registration and login, with and without the '
+            'legacy "save the profile on every User save" receiver. Nothing is persisted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20, help='Number of logins to average over.')
+
+    def measure(self, logins):
+        client = Client(HTTP_HOST='localhost')
+        password = 'Bench-mark-Pa55word'
+        with CaptureQueriesContext(connection) as registration:
+            client.post(reverse('register'), {
+                'username': 'benchmark-user',
+                'email': 'benchmark@example.com',
+                'password1': password,
+                'password2': password,
+            })
+        if not User.objects.filter(username='benchmark-user').exists():
+            raise RuntimeError('Registration failed; check the form fields used by the benchmark.')
+        login_queries = []
+        for _ in range(logins):
+            client.logout()
+            with CaptureQueriesContext(connection) as login:
+                client.post(reverse('login'), {'username': 'benchmark-user', 'password': password})
+            login_queries.append(len(login))
+        return len(registration), sum(login_queries) / len(login_queries)
+
+    def measure_rolled_back(self, logins):
+        result = None
+        try:
+            with transaction.atomic():
+                result = self.measure(logins)
+                raise Rollback
+        except Rollback:
+            pass
+        return result
+
+    def handle(self, *args, **options):
+        logins = options['logins']
+        post_save.connect(legacy_save_user_profile, sender=User, dispatch_uid='benchmark-legacy-profile-save')
+        try:
+            before = self.measure_rolled_back(logins)
+        finally:
+            post_save.disconnect(sender=User, dispatch_uid='benchmark-legacy-profile-save')
+        after = self.measure_rolled_back(logins)
+
+        self.stdout.write(f'{"":<24}{"before":>10}{"after":>10}')
+        self.stdout.write(f'{"queries/registration":<24}{before[0]:>10}{after[0]:>10}')
+        self.stdout.write(f'{"queries/login":<24}{before[1]:>10.1f}{after[1]:>10.1f}')
@@ -0,0 +1,148 @@
+import copy
+import statistics
+import threading
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import reverse
+
+MODES = ['fresh', 'persistent', 'pooled']
+
+
+class ConnectTimer:
+    """Time every new backend connection (or pool checkout) made on any thread."""
+
+    def __init__(self, wrapper_class):
+        self.wrapper_class = wrapper_class
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.seconds = 0.0
+
+    def __enter__(self):
+        original = self.original = self.wrapper_class.get_new_connection
+        timer = self
+
+        def get_new_connection(wrapper, conn_params):
+            started = time.perf_counter()
+            try:
+                return original(wrapper, conn_params)
+            finally:
+                with timer.lock:
+                    timer.calls += 1
+                    timer.seconds += time.perf_counter() - started
+
+        self.wrapper_class.get_new_connection = get_new_connection
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wrapper_class.get_new_connection = self.original
+
+
+class Command(BaseCommand):
+    help = ('Load-test a page through the full request cycle from concurrent threads with a fresh '
+            'connection per request, persistent connections and the connection pool, and report '
+            'latency alongside the time spent opening (or checking out) connections.')
+
+    def add_arguments(self, parser):
+        # Search always queries the database; cached pages such as the post list may not
+        parser.add_argument('--path', help='Path to request. Defaults to a post search.')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=50, help='Requests per thread.')
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+
+    def handle(self, *args, **options):
+        path = options['path'] or f'{reverse("post-search")}?q=django'
+        settings_dict = connections.settings[DEFAULT_DB_ALIAS]
+        if 'pooled' in options['modes'] and connections[DEFAULT_DB_ALIAS].vendor != 'postgresql':
+            raise CommandError('The pooled mode needs PostgreSQL; pass --modes fresh persistent.')
+
+        original = copy.deepcopy(settings_dict)
+        results = []
+        try:
+            for mode in options['modes']:
+                self.configure(settings_dict, original, mode)
+                results.append((mode, self.run(path, options['threads'], options['requests'])))
+        finally:
+            settings_dict.clear()
+            settings_dict.update(original)
+
+        self.stdout.write(f'{path} with {options["threads"]} threads x {options["requests"]} requests')
+        self.stdout.write(f'{"mode":<12}{"req/s":>8}{"p50 ms":>9}{"p95 ms":>9}{"connects":>10}{"connect ms/req":>16}')
+        for mode, result in results:
+            self.stdout.write(
+                f'{mode:<12}{result["throughput"]:>8.0f}{result["p50"]:>9.1f}{result["p95"]:>9.1f}'
+                f'{result["connects"]:>10}{result["connect_ms"]:>16.2f}'
+            )
+
+    def configure(self, settings_dict, original, mode):
+        # Worker threads build their own connection from these settings, so
+        # changing them here switches the mode for the next run.
+        settings_dict.clear()
+        settings_dict.update(copy.deepcopy(original))
+        options = settings_dict.setdefault('OPTIONS', {})
+        if mode == 'pooled':
+            options.setdefault('pool', True)
+            settings_dict['CONN_MAX_AGE'] = 0
+            settings_dict['CONN_HEALTH_CHECKS'] = True
+        else:
+            options.pop('pool', None)
+            settings_dict['CONN_MAX_AGE'] = 0 if mode == 'fresh' else None
+            settings_dict['CONN_HEALTH_CHECKS'] = mode == 'persistent'
+
+    def run(self, path, threads, requests):
+        handler = WSGIHandler()
+        path_info, _, query_string = path.partition('?')
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker():
+            timings = []
+            try:
+                for _ in range(requests):
+                    environ = {'PATH_INFO': path_info, 'QUERY_STRING': query_string, 'HTTP_HOST': 'localhost'}
+                    setup_testing_defaults(environ)
+                    started = time.perf_counter()
+                    status = []
+                    response = handler(environ, lambda s, headers, exc_info=None: status.append(s))
+                    try:
+                        for _chunk in response:
+                            pass
+                    finally:
+                        # Sends request_finished, which closes or returns the connection
+                        response.close()
+                    timings.append(time.perf_counter() - started)
+                    if not status[0].startswith('200'):
+                        raise CommandError(f'{path} returned {status[0]}')
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+                with lock:
+                    latencies.extend(timings)
+
+        wrapper_class = type(connections[DEFAULT_DB_ALIAS])
+        with ConnectTimer(wrapper_class) as timer:
+            started = time.perf_counter()
+            workers = [threading.Thread(target=worker) for _ in range(threads)]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        if hasattr(wrapper_class, 'close_pool'):
+            connections[DEFAULT_DB_ALIAS].close_pool()
+        if errors:
+            raise errors[0]
+
+        latencies.sort()
+        return {
+            'throughput': len(latencies) / elapsed,
+            'p50': statistics.median(latencies) * 1000,
+            'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            'connects': timer.calls,
+            'connect_ms': timer.seconds * 1000 / len(latencies),
+        }
@@ -0,0 +1,90 @@
+import statistics
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from blog.models import Post
+from blog.views import PostListView
+
+# Fields a post list screen needs: everything but the bodies
+LIST_FIELDS = 'id,url,title,author,tags,published_date,comment_count'
+
+
+class Command(BaseCommand):
+    help = ('Compare the HTML post list with the JSON API (all fields, and the sparse fieldset a list '
+            'screen needs) on the first and a deep page: response size, queries and latency.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per target.')
+        parser.add_argument('--depth', type=int, default=50, help='Page to use as the deep page.')
+        parser.add_argument('--cold', action='store_true',
+                            help='Clear the cache before every request, so the HTML list is rendered each time.')
+
+    def handle(self, *args, **options):
+        if not Post.objects.exists():
+            raise CommandError('There are no posts; run generate_benchmark_data first.')
+        client = Client(HTTP_HOST='localhost')
+        targets = self.targets(client, options['depth'])
+
+        self.stdout.write(f'{options["requests"]} requests per target{" (cold cache)" if options["cold"] else ""}')
+        self.stdout.write(f'{"target":<26}{"bytes":>9}{"queries":>9}{"p50 ms":>9}{"p95 ms":>9}')
+        for name, path, accept in targets:
+            result = self.run(client, path, accept, options['requests'], options['cold'])
+            self.stdout.write(
+                f'{name:<26}{result["bytes"]:>9}{result["queries"]:>9}{result["p50"]:>9.2f}{result["p95"]:>9.2f}'
+            )
+
+    def targets(self, client, depth):
+        # Same page size and keyset as the HTML list, so the same cursor selects the same posts
+        per_page = PostListView.paginate_by
+        paths = [
+            ('HTML', reverse('post-list'), 'text/html'),
+            ('API', f'{reverse("api-post-list")}?page_size={per_page}', 'application/json'),
+            ('API sparse', f'{reverse("api-post-list")}?page_size={per_page}&fields={LIST_FIELDS}', 'application/json'),
+        ]
+        cursor = self.walk(client, per_page, depth)
+        targets = [(f'{name}, first page', path, accept) for name, path, accept in paths]
+        targets += [
+            (f'{name}, page {depth}', f'{path}{"&" if "?" in path else "?"}cursor={cursor}', accept)
+            for name, path, accept in paths
+        ]
+        return targets
+
+    def walk(self, client, per_page, depth):
+        """Follow the API's next links to the cursor of page `depth` (or the last page)."""
+        url = f'{reverse("api-post-list")}?page_size={per_page}&fields=id'
+        cursor = ''
+        for _ in range(depth - 1):
+            next_url = client.get(url, HTTP_ACCEPT='application/json').json()['next']
+            if not next_url:
+                break
+            url = next_url
+            cursor = parse_qs(urlsplit(next_url).query)['cursor'][0]
+        return cursor
+
+    def run(self, client, path, accept, requests, cold):
+        latencies = []
+        size = queries = 0
+        for _ in range(requests + 1):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(path, HTTP_ACCEPT=accept)
+                latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(f'{path} returned {response.status_code}')
+            size, queries = len(response.content), len(captured)
+        latencies = sorted(latencies[1:])  # the first request warms up
+        return {
+            'bytes': size,
+            'queries': queries,
+            'p50': statistics.median(latencies) * 1000,
+            'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        }
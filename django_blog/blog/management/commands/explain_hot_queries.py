@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.db.models import Count
+
+from blog.models import Comment, Post
+from blog.views import COMMENT_KEYSET, PostListView, comments_per_page
+
+# The indexes added by migration 0012 and the single-column foreign key indexes they replaced
+HOT_PATH_INDEXES = [(Post, 'blog_post_author_idx'), (Comment, 'blog_comment_post_idx')]
+REPLACED_INDEXES = [
+    (Post, models.Index(fields=['author'], name='blog_post_author_id_bench')),
+    (Comment, models.Index(fields=['post'], name='blog_comment_post_id_bench')),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Print the query plans of the blog hot paths (post list, an author\'s posts, a post\'s '
+            'comments). With --compare, also print them as they were before the composite indexes, '
+            'by swapping the indexes inside a transaction that is rolled back (PostgreSQL only).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compare', action='store_true')
+        parser.add_argument('--analyze', action='store_true', help='EXPLAIN ANALYZE (PostgreSQL only); runs the queries.')
+
+    def handle(self, *args, **options):
+        postgres = connection.vendor == 'postgresql'
+        if options['compare'] and not postgres:
+            raise CommandError('--compare needs transactional DDL, i.e. PostgreSQL.')
+        self.explain_options = {'analyze': True, 'buffers': True} if options['analyze'] and postgres else {}
+
+        queries = self.hot_queries()
+        if options['compare']:
+            self.stdout.write(self.style.MIGRATE_HEADING('Before the composite indexes'))
+            try:
+                with transaction.atomic():
+                    self.swap_indexes()
+                    self.print_plans(queries)
+                    raise Rollback
+            except Rollback:
+                pass
+            self.stdout.write(self.style.MIGRATE_HEADING('With the composite indexes'))
+        self.print_plans(queries)
+
+    def hot_queries(self):
+        # Parameters that make the plans interesting: the busiest author and the most commented post
+        busiest_author = (
+            Post.objects.values('author').annotate(total=Count('pk')).order_by('-total').values_list('author', flat=True).first()
+        )
+        viral_post = Post.objects.order_by('-comment_count').values_list('pk', flat=True).first()
+        if viral_post is None:
+            raise CommandError('There are no posts; run generate_benchmark_data first.')
+        per_page = PostListView.paginate_by
+        newest = PostListView.orderings['newest'][1]
+        return [
+            ('Post list, first page', Post.objects.select_related('author').order_by(*newest)[:per_page + 1]),
+            (f'Posts by author #{busiest_author}', Post.objects.filter(author=busiest_author).order_by(*newest)[:per_page + 1]),
+            (f'Comments of post #{viral_post}, first page', Comment.objects.filter(post=viral_post, is_approved=True).select_related('author').order_by(*COMMENT_KEYSET)[:comments_per_page() + 1]),
+        ]
+
+    def swap_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, name in HOT_PATH_INDEXES:
+                editor.remove_index(model, next(index for index in model._meta.indexes if index.name == name))
+            for model, index in REPLACED_INDEXES:
+                editor.add_index(model, index)
+
+    def print_plans(self, queries):
+        for title, queryset in queries:
+            self.stdout.write(self.style.SQL_TABLE(title))
+            self.stdout.write(queryset.explain(**self.explain_options))
+            self.stdout.write('')
@@ -0,0 +1,73 @@
+import csv
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from blog.models import Comment, Post
+
+CSV_FIELDS = ['title', 'content', 'author', 'published_date', 'tags']
+
+
+class Command(BaseCommand):
+    help = ('Export posts to JSON Lines (with tags and comments) or CSV (with tags), '
+            'streaming rows in chunks so memory stays flat.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to write, or '-' for stdout.")
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        chunk_size = options['chunk_size']
+
+        posts = Post.objects.select_related('author').prefetch_related('tags').order_by('pk')
+        if fmt == 'jsonl':
+            posts = posts.prefetch_related(
+                Prefetch('comments', queryset=Comment.objects.select_related('author').order_by('created_at', 'pk'))
+            )
+        # iterator() fetches (and prefetches for) chunk_size posts at a time instead of the whole table
+        posts = posts.iterator(chunk_size=chunk_size)
+
+        stream = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        total = 0
+        try:
+            if fmt == 'csv':
+                writer = csv.DictWriter(stream, fieldnames=CSV_FIELDS)
+                writer.writeheader()
+                for post in posts:
+                    record = self.serialize(post)
+                    record['tags'] = ', '.join(record['tags'])
+                    writer.writerow(record)
+                    total += 1
+            else:
+                for post in posts:
+                    record = self.serialize(post)
+                    record['comments'] = [
+                        {
+                            'author': comment.author.username,
+                            'content': comment.content,
+                            'created_at': comment.created_at.isoformat(),
+                            'is_approved': comment.is_approved,
+                        }
+                        for comment in post.comments.all()
+                    ]
+                    stream.write(json.dumps(record) + '\n')
+                    total += 1
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        if stream is not sys.stdout:
+            self.stdout.write(self.style.SUCCESS(f'Exported {total} posts to {path}.'))
+
+    def serialize(self, post):
+        return {
+            'title': post.title,
+            'content': post.content,
+            'author': post.author.username,
+            'published_date': post.published_date.isoformat(),
+            'tags': sorted(tag.name for tag in post.tags.all()),
+        }
@@ -0,0 +1,89 @@
+import random
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from blog.cache import invalidate_post_lists
+from blog.models import Comment, Post
+
+USERNAME_PREFIX = 'bench-author-'
+
+
+class Command(BaseCommand):
+    help = ('Fill the database with synthetic authors, posts and comments (a million posts by default) '
+            'for query plan and load benchmarks. One "viral" post gets a large share of the comments. '
+            'Rows are bulk inserted, so the search index is not updated.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--comments', type=int, default=2_000_000)
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--viral-share', type=float, default=0.05,
+                            help='Fraction of the comments that go to a single post.')
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['posts'] < 1 or options['authors'] < 1:
+            raise CommandError('Generate at least one author and one post.')
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        author_ids = self.create_authors(options['authors'])
+        post_ids = self.create_posts(options['posts'], author_ids)
+        viral_id = self.create_comments(options['comments'], post_ids, author_ids, options['viral_share'])
+
+        self.stdout.write('Updating comment stats...')
+        Post.objects.filter(pk__gte=post_ids[0]).refresh_comment_stats()  # the new posts are the newest rows
+        invalidate_post_lists()
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(post_ids)} posts and {options["comments"]} comments; the viral post is #{viral_id}.'
+        ))
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield range(start, min(start + self.batch_size, total))
+
+    def create_authors(self, count):
+        existing = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+        new_users = []
+        for index in range(existing, count):
+            user = User(username=f'{USERNAME_PREFIX}{index}')
+            user.set_unusable_password()
+            new_users.append(user)
+        # Profiles aren't needed to author posts, and bulk_create skips the signal that makes them
+        User.objects.bulk_create(new_users, batch_size=self.batch_size)
+        return list(User.objects.filter(username__startswith=USERNAME_PREFIX).values_list('pk', flat=True)[:count])
+
+    def create_posts(self, count, author_ids):
+        post_ids = []
+        for batch in self.batches(count):
+            with transaction.atomic():
+                posts = Post.objects.bulk_create([
+                    Post(
+                        title=f'Benchmark post {index}',
+                        content=f'Synthetic content for benchmark post {index}.',
+                        author_id=self.random.choice(author_ids),
+                    )
+                    for index in batch
+                ])
+            post_ids.extend(post.pk for post in posts)
+            self.stdout.write(f'{len(post_ids)} posts...')
+        return post_ids
+
+    def create_comments(self, count, post_ids, author_ids, viral_share):
+        viral_id = post_ids[-1]
+        created = 0
+        for batch in self.batches(count):
+            with transaction.atomic():
+                Comment.objects.bulk_create([
+                    Comment(
+                        post_id=viral_id if self.random.random() < viral_share else self.random.choice(post_ids),
+                        author_id=self.random.choice(author_ids),
+                        content=f'Benchmark comment {index}',
+                    )
+                    for index in batch
+                ])
+            created += len(batch)
+            self.stdout.write(f'{created} comments...')
+        return viral_id
@@ -0,0 +1,159 @@
+import csv
+import json
+import sys
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from taggit.models import Tag, TaggedItem
+
+from blog.cache import invalidate_post_lists
+from blog.models import Comment, Post, TagStat
+from blog.search import get_search_engine
+
+
+def read_records(stream, fmt):
+    """Yield one dict per post without loading the whole file."""
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            row['tags'] = [tag.strip() for tag in (row.get('tags') or '').split(',') if tag.strip()]
+            yield row
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def parse_timestamp(value):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise CommandError(f'Invalid timestamp: {value!r}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = 'Import posts (with tags and, for JSON Lines, comments) from a JSON Lines or CSV file in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or '-' for stdin.")
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--create-authors', action='store_true',
+                            help='Create missing authors (with unusable passwords) instead of failing.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        self.batch_size = options['batch_size']
+        self.create_authors = options['create_authors']
+        self.authors = {}
+        self.tags = {}
+        self.touched_tag_ids = set()
+        self.content_type = ContentType.objects.get_for_model(Post)
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        total = 0
+        try:
+            records = read_records(stream, fmt)
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    break
+                self.import_batch(batch)
+                total += len(batch)
+                self.stdout.write(f'Imported {total} posts...')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        TagStat.objects.refresh(self.touched_tag_ids)
+        invalidate_post_lists()
+        self.stdout.write(self.style.SUCCESS(f'Imported {total} posts.'))
+
+    def resolve_authors(self, usernames):
+        missing = set(usernames) - self.authors.keys()
+        if missing:
+            self.authors.update(User.objects.filter(username__in=missing).values_list('username', 'pk'))
+        missing -= self.authors.keys()
+        if missing and not self.create_authors:
+            raise CommandError(f'Unknown authors: {", ".join(sorted(missing))} (use --create-authors)')
+        for username in missing:
+            self.authors[username] = User.objects.create_user(username=username).pk
+
+    def resolve_tags(self, names):
+        missing = set(names) - self.tags.keys()
+        if missing:
+            self.tags.update(Tag.objects.filter(name__in=missing).values_list('name', 'pk'))
+            new_tags = []
+            for name in missing - self.tags.keys():
+                tag = Tag(name=name)
+                tag.slug = tag.slugify(name)
+                new_tags.append(tag)
+            Tag.objects.bulk_create(new_tags, ignore_conflicts=True)
+            self.tags.update(Tag.objects.filter(name__in=missing).values_list('name', 'pk'))
+            # Names whose slug clashed with an existing tag go through Tag.save(), which de-duplicates slugs
+            for name in missing - self.tags.keys():
+                self.tags[name] = Tag.objects.create(name=name).pk
+
+    @transaction.atomic
+    def import_batch(self, batch):
+        self.resolve_authors({record['author'] for record in batch})
+        self.resolve_tags({name for record in batch for name in record.get('tags') or []})
+
+        posts = Post.objects.bulk_create([
+            Post(title=record['title'], content=record['content'], author_id=self.authors[record['author']])
+            for record in batch
+        ])
+        # auto_now_add overrides published_date on insert, so restore imported dates afterwards
+        dated = []
+        for post, record in zip(posts, batch):
+            published = parse_timestamp(record.get('published_date'))
+            if published:
+                post.published_date = published
+                dated.append(post)
+        Post.objects.bulk_update(dated, ['published_date'])
+
+        tagged_items = []
+        for post, record in zip(posts, batch):
+            for name in set(record.get('tags') or []):
+                tagged_items.append(TaggedItem(content_type=self.content_type, object_id=post.pk, tag_id=self.tags[name]))
+                self.touched_tag_ids.add(self.tags[name])
+        TaggedItem.objects.bulk_create(tagged_items)
+
+        self.import_comments(posts, batch)
+
+        # bulk_create skips the signals that maintain the denormalized data
+        post_ids = [post.pk for post in posts]
+        Post.objects.filter(pk__in=post_ids).refresh_comment_stats()
+        get_search_engine().index(post_ids)
+
+    def import_comments(self, posts, batch):
+        comments = [
+            (post, comment)
+            for post, record in zip(posts, batch)
+            for comment in record.get('comments') or []
+        ]
+        if not comments:
+            return
+        self.resolve_authors({comment['author'] for _, comment in comments})
+        created = Comment.objects.bulk_create([
+            # Files exported before moderation existed have no is_approved: their comments were all public
+            Comment(post=post, author_id=self.authors[comment['author']], content=comment['content'],
+                    is_approved=comment.get('is_approved', True))
+            for post, comment in comments
+        ])
+        dated = []
+        for instance, (_, comment) in zip(created, comments):
+            timestamp = parse_timestamp(comment.get('created_at'))
+            if timestamp:
+                instance.created_at = timestamp
+                dated.append(instance)
+        Comment.objects.bulk_update(dated, ['created_at'])
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from blog.cache import invalidate_post_lists
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized comment_count and last_comment_at of every post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        # One UPDATE per range of primary keys keeps each statement (and its locks) small
+        last_pk = 0
+        total = 0
+        while True:
+            pks = list(
+                Post.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+            total += Post.objects.filter(pk__gte=pks[0], pk__lte=pks[-1]).refresh_comment_stats()
+            last_pk = pks[-1]
+        invalidate_post_lists()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed comment stats for {total} posts.'))
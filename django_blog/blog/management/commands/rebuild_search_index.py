@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from blog.models import Post
+from blog.search import get_search_engine
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search index for all blog posts in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        engine = get_search_engine()
+        batch_size = options['batch_size']
+        post_ids = Post.objects.order_by('pk').values_list('pk', flat=True)
+        batch = []
+        total = 0
+        for post_id in post_ids.iterator(chunk_size=batch_size):
+            batch.append(post_id)
+            if len(batch) == batch_size:
+                engine.index(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            engine.index(batch)
+            total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} posts with {type(engine).__name__}.'))
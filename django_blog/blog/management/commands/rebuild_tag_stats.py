@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from blog.models import TagStat
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed post count and latest post date of every tag.'
+
+    def handle(self, *args, **options):
+        TagStat.objects.refresh()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed stats for {TagStat.objects.count()} tags.'))
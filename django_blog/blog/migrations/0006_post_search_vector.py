@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:26
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# The GIN index and the backfill only apply to Postgres; other databases
+# use blog.search.SimpleSearchEngine and leave search_vector empty.
+CREATE_INDEX_SQL = 'CREATE INDEX IF NOT EXISTS blog_post_search_vector_gin ON blog_post USING gin (search_vector)'
+DROP_INDEX_SQL = 'DROP INDEX IF EXISTS blog_post_search_vector_gin'
+BACKFILL_SQL = """
+UPDATE blog_post p SET search_vector =
+    setweight(to_tsvector('english', coalesce(p.title, '')), 'A')
+    || setweight(to_tsvector('english', coalesce(p.content, '')), 'B')
+    || setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(t.name, ' ')
+        FROM taggit_taggeditem ti
+        JOIN taggit_tag t ON t.id = ti.tag_id
+        JOIN django_content_type ct ON ct.id = ti.content_type_id
+        WHERE ct.app_label = 'blog' AND ct.model = 'post' AND ti.object_id = p.id
+    ), '')), 'C')
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_INDEX_SQL)
+        schema_editor.execute(BACKFILL_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_post_tags'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+
+
+def backfill_tag_stats(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    TagStat = apps.get_model('blog', 'TagStat')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    published = Post.objects.filter(pk=OuterRef('object_id')).values('published_date')
+    rows = TaggedItem.objects.filter(
+        content_type__app_label='blog', content_type__model='post'
+    ).order_by().values('tag_id').annotate(total=Count('pk'), latest=Max(Subquery(published)))
+    TagStat.objects.bulk_create(
+        [TagStat(tag_id=row['tag_id'], post_count=row['total'], latest_post_at=row['latest']) for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_post_comment_stats'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagStat',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='blog_stat', serialize=False, to='taggit.tag')),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('latest_post_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-post_count'], name='blog_tagstat_post_count_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_tag_stats, migrations.RunPython.noop),
+    ]
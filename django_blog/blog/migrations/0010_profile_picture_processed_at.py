@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_tagstat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='profile_picture_processed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:38
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_published_date(apps, schema_editor):
+    # Existing posts were last modified, as far as we know, when they were published
+    Post = apps.get_model('blog', 'Post')
+    Post.objects.update(updated_at=F('published_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_profile_picture_processed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_published_date, migrations.RunPython.noop),
+    ]
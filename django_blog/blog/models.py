@@ -1,22 +1,83 @@
 from django.db import models
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.urls import reverse
+from django.utils import timezone
+from django.contrib.contenttypes.models import ContentType
 from taggit.managers import TaggableManager
+from taggit.models import Tag, TaggedItem
+from .cache import invalidate_post, invalidate_tag_cloud
+from .search import get_search_engine
 
 # Create your models here.
+class PostQuerySet(models.QuerySet):
+    def with_last_activity(self):
+        # Most recent comment, or the publication date for posts without comments
+        return self.annotate(last_activity=Coalesce('last_comment_at', 'published_date'))
+
+    def refresh_comment_stats(self):
+        """Recompute comment_count and last_comment_at (approved comments only) for these posts in one UPDATE."""
+        comments = Comment.objects.filter(post=OuterRef('pk'), is_approved=True).order_by().values('post')
+        return self.update(
+            comment_count=Coalesce(Subquery(comments.annotate(total=Count('pk')).values('total')), 0),
+            last_comment_at=Subquery(comments.annotate(latest=Max('created_at')).values('latest')),
+        )
+
+
 class Post(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
     published_date = models.DateTimeField(auto_now_add=True)
-    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
+    updated_at = models.DateTimeField(auto_now=True)  # also touched when the tags change
+    # Indexed by blog_post_author_idx below, which also serves plain author lookups
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts', db_index=False)
     tags = TaggableManager(blank=True)  # <--- use taggit manager
+    # Full-text index of title, content and tag names (kept up to date by the search engine)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Denormalized stats of the approved comments, maintained by the Comment signals below
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_comment_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Page views, buffered in memory and added in batches (see blog/counters.py)
+    view_count = models.PositiveBigIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    # Changed in place with F() updates, never through save()
+    COUNTER_FIELDS = frozenset({'comment_count', 'last_comment_at', 'view_count'})
+
+    class Meta:
+        indexes = [
+            # Backs the (published_date, pk) keyset used to paginate post lists
+            models.Index(fields=['-published_date', '-id'], name='blog_post_published_idx'),
+            # An author's posts, newest first
+            models.Index(fields=['author', '-published_date', '-id'], name='blog_post_author_idx'),
+            # Back the "most discussed" and "most active" list orderings
+            models.Index(fields=['-comment_count', '-id'], name='blog_post_comments_idx'),
+            models.Index(
+                Coalesce('last_comment_at', 'published_date').desc(), F('id').desc(),
+                name='blog_post_activity_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, **kwargs):
+        # An edit saves the values loaded with the instance; leave out the counters, or
+        # views flushed and comments counted since then would be overwritten
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            skipped = self.COUNTER_FIELDS | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped and field.attname not in skipped
+            ]
+        super().save(**kwargs)
+
     def get_absolute_url(self):
         return reverse('post-detail', kwargs={'pk': self.pk})
     
@@ -24,6 +85,8 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     bio = models.TextField(blank=True)
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
+    # Set once the background task has stripped the upload and written its renditions (see blog/images.py)
+    profile_picture_processed_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.user.username}'s profile"
@@ -32,21 +95,178 @@ class Profile(models.Model):
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
+    # Only new users need a write here: profile changes are saved by the views that
+    # make them, so routine User saves (e.g. last_login on every login) leave it alone.
     if created:
         Profile.objects.create(user=instance)
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
-
 #Comment functionality to blogposts
 class Comment(models.Model):
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
+    # Indexed by blog_comment_post_idx below, which also serves plain post lookups
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments', db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Comments are shown until a moderator unapproves them (see CommentAdmin)
+    is_approved = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            # Backs the (created_at, pk) keyset that pages a post's comments, newest first,
+            # and the per-post comment stats
+            models.Index(fields=['post', '-created_at', '-id'], name='blog_comment_post_idx'),
+            # The post page's validator (see blog/conditional.py): its latest comment edit is one index lookup
+            models.Index(fields=['post', '-updated_at'], name='blog_comment_updated_idx'),
+            # The moderation queue: only the few unapproved comments are indexed
+            models.Index(fields=['-created_at'], condition=models.Q(is_approved=False), name='blog_comment_pending_idx'),
+        ]
 
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post.title}"
-    
\ No newline at end of file
+
+#Precomputed per-tag statistics, so tag browsing never groups over the tagged items table.
+class TagStatManager(models.Manager):
+    def refresh(self, tag_ids=None):
+        """Recompute the stats of the given tags (all tags when tag_ids is None)."""
+        tagged = TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(Post))
+        if tag_ids is not None:
+            tag_ids = set(tag_ids)
+            if not tag_ids:
+                return
+            tagged = tagged.filter(tag_id__in=tag_ids)
+        published = Post.objects.filter(pk=OuterRef('object_id')).values('published_date')
+        rows = tagged.order_by().values('tag_id').annotate(
+            total=Count('pk'),
+            latest=Max(Subquery(published)),
+        )
+        stats = [TagStat(tag_id=row['tag_id'], post_count=row['total'], latest_post_at=row['latest']) for row in rows]
+        self.bulk_create(
+            stats,
+            update_conflicts=True,
+            unique_fields=['tag'],
+            update_fields=['post_count', 'latest_post_at'],
+        )
+        # Tags that no longer label any post drop out of the stats
+        stale = self.exclude(tag_id__in=tagged.values('tag_id'))
+        if tag_ids is not None:
+            stale = stale.filter(tag_id__in=tag_ids)
+        stale.delete()
+        invalidate_tag_cloud()
+
+
+class TagStat(models.Model):
+    tag = models.OneToOneField(Tag, on_delete=models.CASCADE, primary_key=True, related_name='blog_stat')
+    post_count = models.PositiveIntegerField(default=0)
+    latest_post_at = models.DateTimeField(null=True, blank=True)
+
+    objects = TagStatManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-post_count'], name='blog_tagstat_post_count_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tag.name} ({self.post_count} posts)"
+
+#Page views per post and day, flushed in batches with Post.view_count; trending posts are ranked on the recent days.
+class PostDailyViews(models.Model):
+    # Indexed by the unique constraint below, which leads with the post
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='daily_views', db_index=False)
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'day'], name='blog_postdailyviews_post_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='blog_postdailyviews_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} on {self.day}: {self.views} views"
+
+#Signals to keep the denormalized comment stats on Post up to date with atomic F() updates.
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created and instance.is_approved:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F('comment_count') + 1,
+            last_comment_at=instance.created_at,
+        )
+
+@receiver(pre_delete, sender=Post)
+def remember_deleted_post(sender, instance, origin=None, **kwargs):
+    # Marked on the object being deleted (a post, a queryset, a user...), so that the
+    # comments deleted along with a post don't each update the post and expire its cache
+    if origin is not None:
+        origin.__dict__.setdefault('_deleted_post_ids', set()).add(instance.pk)
+
+def deleted_with_post(instance, origin):
+    return instance.post_id in getattr(origin, '_deleted_post_ids', ())
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, origin=None, **kwargs):
+    if not instance.is_approved or deleted_with_post(instance, origin):
+        return
+    latest = Comment.objects.filter(post=instance.post_id, is_approved=True).order_by('-created_at').values('created_at')[:1]
+    Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1,
+        last_comment_at=Subquery(latest),
+    )
+
+#Signals to keep the search index in sync with posts and their tags.
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    get_search_engine().index([instance.pk])
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def index_post_tags(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Post):
+        get_search_engine().index([instance.pk])
+
+#Signals to expire cached post fragments whenever a post, its tags or its comments change.
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_cache(sender, instance, **kwargs):
+    invalidate_post(instance.pk)
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_post_tags_cache(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Post):
+        # Tags are part of the rendered post, so they count as a modification (see blog/conditional.py)
+        Post.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+        invalidate_post(instance.pk)
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_cache(sender, instance, origin=None, **kwargs):
+    # A deleted post expires its cache itself (invalidate_post_cache)
+    if not deleted_with_post(instance, origin):
+        invalidate_post(instance.post_id)
+
+#Signals to refresh the stats of the tags touched by a post's tag changes or deletion.
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def refresh_tag_stats(sender, instance, action, pk_set, **kwargs):
+    if not isinstance(instance, Post):
+        return
+    if action == 'pre_clear':
+        instance._cleared_tag_ids = list(instance.tags.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        TagStat.objects.refresh(getattr(instance, '_cleared_tag_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        TagStat.objects.refresh(pk_set)
+
+@receiver(pre_delete, sender=Post)
+def remember_deleted_post_tags(sender, instance, **kwargs):
+    instance._deleted_tag_ids = list(instance.tags.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Post)
+def refresh_deleted_post_tag_stats(sender, instance, **kwargs):
+    TagStat.objects.refresh(getattr(instance, '_deleted_tag_ids', []))
@@ -0,0 +1,183 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import SimpleLazyObject
+
+# Keyset (cursor) pagination: instead of OFFSET, each page continues from the
+# ordering values of the last row it showed, so deep pages cost the same as
+# page one as long as an index matches the keyset.
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({
+        'd': direction,
+        'v': [value.isoformat() if isinstance(value, (datetime.date, datetime.time)) else value for value in values],
+    })
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction, values = payload['d'], payload['v']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor('Invalid cursor.')
+    if direction not in ('next', 'previous') or not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor('Invalid cursor.')
+    return direction, values
+
+
+class KeysetPage:
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self.object_list)} objects>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next:
+            return self.paginator.cursor_for(self.object_list[-1], 'next')
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous:
+            return self.paginator.cursor_for(self.object_list[0], 'previous')
+
+
+class KeysetPaginator:
+    """Paginate a queryset by cursor over `keys`, e.g. ('-published_date', '-pk').
+
+    The last key must be unique (normally the primary key) so that every row has
+    exactly one position in the ordering.
+    """
+
+    def __init__(self, queryset, per_page, keys=('-published_date', '-pk')):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.keys = [(key.lstrip('-'), key.startswith('-')) for key in keys]
+
+    def cursor_for(self, obj, direction):
+        return encode_cursor([getattr(obj, name) for name, _ in self.keys], direction)
+
+    def _ordering(self, reverse):
+        return [f'{"-" if descending != reverse else ""}{name}' for name, descending in self.keys]
+
+    def _after(self, values, reverse):
+        # Rows strictly after `values` in the (possibly reversed) ordering:
+        # (a > va) OR (a = va AND b > vb) OR ...
+        condition = Q()
+        for index, (name, descending) in enumerate(self.keys):
+            lookups = {self.keys[i][0]: values[i] for i in range(index)}
+            lookups[f'{name}__{"lt" if descending != reverse else "gt"}'] = values[index]
+            condition |= Q(**lookups)
+        return condition
+
+    def _fetch(self, queryset):
+        return list(queryset[:self.per_page + 1])
+
+    def _build_page(self, rows, cursor, direction):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'previous':
+            rows.reverse()
+            return KeysetPage(rows, self, has_next=True, has_previous=has_more)
+        return KeysetPage(rows, self, has_next=has_more, has_previous=cursor is not None)
+
+    def _page_queryset(self, cursor):
+        if not cursor:
+            return self.queryset.order_by(*self._ordering(reverse=False)), 'next'
+        direction, values = decode_cursor(cursor, len(self.keys))
+        reverse = direction == 'previous'
+        try:
+            queryset = self.queryset.filter(self._after(values, reverse))
+        except (TypeError, ValueError, ValidationError) as exc:
+            raise InvalidCursor('Invalid cursor.') from exc
+        return queryset.order_by(*self._ordering(reverse)), direction
+
+    def page(self, cursor=None):
+        queryset, direction = self._page_queryset(cursor)
+        try:
+            rows = self._fetch(queryset)
+        except (TypeError, ValueError, ValidationError) as exc:
+            raise InvalidCursor('Invalid cursor.') from exc
+        return self._build_page(rows, cursor, direction)
+
+    async def apage(self, cursor=None):
+        queryset, direction = self._page_queryset(cursor)
+        try:
+            rows = [obj async for obj in queryset[:self.per_page + 1]]
+        except (TypeError, ValueError, ValidationError) as exc:
+            raise InvalidCursor('Invalid cursor.') from exc
+        return self._build_page(rows, cursor, direction)
+
+    def lazy_page(self, cursor=None):
+        # Validate the cursor now but only hit the database when the page is used,
+        # so a cached template fragment can skip the query entirely.
+        queryset, direction = self._page_queryset(cursor)
+        return SimpleLazyObject(lambda: self._build_page(self._fetch(queryset), cursor, direction))
+
+
+class KeysetPaginationMixin:
+    """ListView mixin that swaps page-number pagination for KeysetPaginator.
+
+    Pages are selected with ?cursor=...; without it the first page is shown, so
+    existing links keep working.
+    """
+    paginate_by = 10
+    keyset = ('-published_date', '-pk')
+    cursor_kwarg = 'cursor'
+
+    def get_keyset(self):
+        return self.keyset
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, self.get_keyset())
+        try:
+            page = paginator.lazy_page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidPage as exc:
+            raise Http404(str(exc))
+        return (
+            paginator,
+            page,
+            SimpleLazyObject(lambda: page.object_list),
+            SimpleLazyObject(lambda: page.has_other_pages()),
+        )
+
+    async def apaginate_queryset(self, queryset, page_size):
+        # Same as paginate_queryset, but the page is fetched right away with the async ORM
+        paginator = KeysetPaginator(queryset, page_size, self.get_keyset())
+        try:
+            page = await paginator.apage(self.request.GET.get(self.cursor_kwarg))
+        except InvalidPage as exc:
+            raise Http404(str(exc))
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,113 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Read-replica routing for the blog.
+# Reads of blog and taggit models go to a random alias in BLOG_READ_REPLICAS;
+# writes always go to the primary. As soon as a context (request, command,
+# background task) writes one of those models, its later reads stick to the
+# primary too, and PrimaryStickinessMiddleware extends that to the user's next
+# requests with a short-lived cookie, so people always see their own writes.
+
+REPLICATED_APPS = {'blog', 'taggit'}
+
+
+class _DatabaseState:
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = ContextVar('blog_database_state', default=None)
+
+
+def _current_state():
+    state = _state.get()
+    if state is None:
+        state = _DatabaseState()
+        _state.set(state)
+    return state
+
+
+@contextmanager
+def use_primary():
+    """Send every read made inside the block to the primary."""
+    token = _state.set(_DatabaseState(pinned=True))
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in REPLICATED_APPS:
+            return None
+        replicas = getattr(settings, 'BLOG_READ_REPLICAS', [])
+        state = _state.get()
+        if not replicas or (state is not None and (state.pinned or state.wrote)):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in REPLICATED_APPS:
+            return None
+        _current_state().wrote = True
+        # Explicit, so objects read from a replica are still saved to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so objects from any of them can be related
+        aliases = {DEFAULT_DB_ALIAS, *getattr(settings, 'BLOG_READ_REPLICAS', [])}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class PrimaryStickinessMiddleware:
+    """Pin a user's reads to the primary for a few seconds after they write."""
+    cookie_name = 'blog_primary'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = _DatabaseState(pinned=self.cookie_name in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.process_response(state, response)
+
+    async def __acall__(self, request):
+        # Async ORM calls run in a worker thread with a copy of this context, which
+        # still points at the same state object, so their writes are seen here.
+        state = _DatabaseState(pinned=self.cookie_name in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.process_response(state, response)
+
+    def process_response(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                self.cookie_name, '1',
+                max_age=getattr(settings, 'BLOG_REPLICA_STICKY_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
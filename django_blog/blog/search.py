@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, TextField, Value, When
+from django.db.models.functions import Coalesce
+from django.utils.module_loading import import_string
+from taggit.models import TaggedItem
+
+# Search engines used by PostSearchView.
+# Each engine exposes search(query) -> ranked Post queryset, and index(post_ids)
+# to refresh whatever it stores for those posts after they change.
+
+
+def tagged_post_ids(**tag_filters):
+    """Subquery of Post ids tagged with a tag matching tag_filters."""
+    from .models import Post
+    return TaggedItem.objects.filter(
+        content_type=ContentType.objects.get_for_model(Post),
+        **{f'tag__{key}': value for key, value in tag_filters.items()},
+    ).values('object_id')
+
+
+class SimpleSearchEngine:
+    """Fallback for databases without full-text search (e.g. SQLite).
+
+    Tag matches go through a subquery instead of a join, so no .distinct() is needed.
+    """
+
+    def search(self, query):
+        from .models import Post
+        tagged = tagged_post_ids(name__icontains=query)
+        return Post.objects.filter(
+            Q(title__icontains=query) | Q(content__icontains=query) | Q(pk__in=tagged)
+        ).annotate(
+            rank=Case(
+                When(title__icontains=query, then=Value(3)),
+                When(pk__in=tagged, then=Value(2)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('-rank', '-published_date')
+
+    def index(self, post_ids):
+        pass
+
+
+class PostgresSearchEngine:
+    """Ranked full-text search over the GIN-indexed Post.search_vector column."""
+
+    config = 'english'
+
+    def search(self, query):
+        from .models import Post
+        search_query = SearchQuery(query, config=self.config, search_type='websearch')
+        return Post.objects.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-published_date')
+
+    def index(self, post_ids):
+        from .models import Post
+        tag_names = TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Post),
+            object_id=OuterRef('pk'),
+        ).values('object_id').annotate(names=StringAgg('tag__name', ' ')).values('names')
+        Post.objects.filter(pk__in=post_ids).update(
+            search_vector=(
+                SearchVector('title', weight='A', config=self.config)
+                + SearchVector('content', weight='B', config=self.config)
+                + SearchVector(Coalesce(Subquery(tag_names), Value(''), output_field=TextField()), weight='C', config=self.config)
+            )
+        )
+
+
+def get_search_engine():
+    # BLOG_SEARCH_ENGINE overrides the engine picked from the database vendor
+    engine_path = getattr(settings, 'BLOG_SEARCH_ENGINE', None)
+    if engine_path:
+        return import_string(engine_path)()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchEngine()
+    return SimpleSearchEngine()
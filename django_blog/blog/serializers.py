@@ -0,0 +1,109 @@
+from rest_framework import serializers
+
+from .models import Comment, Post, TagStat
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin: ?fields=a,b keeps only those fields in the output.
+
+    Meta.loads tells load_only_requested() what each field reads, so that the
+    queryset loads nothing else: the model fields for only() (by default the
+    field's own name), and the relations to join or prefetch.
+    """
+    fields_param = 'fields'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.requested_fields()
+        if requested is not None:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+    def requested_fields(self):
+        request = self.context.get('request')
+        value = request.query_params.get(self.fields_param) if request is not None else None
+        if not value:
+            return None
+        requested = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = requested - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({self.fields_param: f'Unknown fields: {", ".join(sorted(unknown))}.'})
+        return requested
+
+
+def load_only_requested(queryset, serializer, always=()):
+    """Restrict `queryset` to what the serializer's (remaining) fields read."""
+    loads = getattr(serializer.Meta, 'loads', {})
+    paths, select, prefetch = {'pk', *always}, set(), set()
+    for name in serializer.fields:
+        load = loads.get(name, {})
+        paths.update(load.get('only', (name,)))
+        select.update(load.get('select_related', ()))
+        prefetch.update(load.get('prefetch_related', ()))
+    queryset = queryset.only(*paths)
+    if select:  # select_related() without arguments would follow every foreign key
+        queryset = queryset.select_related(*select)
+    return queryset.prefetch_related(*prefetch)
+
+
+class PostSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    excerpt_length = 200
+
+    url = serializers.SerializerMethodField()
+    excerpt = serializers.SerializerMethodField()
+    author = serializers.CharField(source='author.username', read_only=True)
+    tags = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Post
+        fields = [
+            'id', 'url', 'title', 'excerpt', 'content', 'author', 'tags',
+            'published_date', 'updated_at', 'comment_count', 'view_count',
+        ]
+        read_only_fields = fields
+        loads = {
+            'url': {'only': ()},
+            'excerpt': {'only': ('content',)},
+            'author': {'only': ('author__username',), 'select_related': ('author',)},
+            'tags': {'only': (), 'prefetch_related': ('tags',)},
+        }
+
+    def get_url(self, post):
+        request = self.context.get('request')
+        url = post.get_absolute_url()
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def get_excerpt(self, post):
+        if len(post.content) <= self.excerpt_length:
+            return post.content
+        return post.content[:self.excerpt_length].rsplit(' ', 1)[0] + '…'
+
+    def get_tags(self, post):
+        return [tag.name for tag in post.tags.all()]
+
+
+class CommentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    author = serializers.CharField(source='author.username', read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'post', 'author', 'content', 'created_at']
+        read_only_fields = fields
+        loads = {
+            'post': {'only': ('post_id',)},
+            'author': {'only': ('author__username',), 'select_related': ('author',)},
+        }
+
+
+class TagSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    name = serializers.CharField(source='tag.name', read_only=True)
+    slug = serializers.CharField(source='tag.slug', read_only=True)
+
+    class Meta:
+        model = TagStat
+        fields = ['name', 'slug', 'post_count', 'latest_post_at']
+        read_only_fields = fields
+        loads = {
+            'name': {'only': ('tag__name',), 'select_related': ('tag',)},
+            'slug': {'only': ('tag__slug',), 'select_related': ('tag',)},
+        }
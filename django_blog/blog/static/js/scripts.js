@@ -1,4 +1,29 @@
 // Basic example script to demonstrate dynamic behavior
 document.addEventListener('DOMContentLoaded', function() {
     console.log('Blog page loaded');
-});
\ No newline at end of file
+});
+
+// "Load more comments": fetch the next page of comments as an HTML fragment and
+// put it in place of the link (which carries on to the page after that)
+document.addEventListener('click', function(event) {
+    const link = event.target.closest('a[data-load-more]');
+    if (!link) {
+        return;
+    }
+    event.preventDefault();
+    const item = link.closest('li');
+    fetch(link.href, {headers: {'Accept': 'text/html'}})
+        .then(function(response) {
+            if (!response.ok) {
+                throw new Error(response.statusText);
+            }
+            return response.text();
+        })
+        .then(function(html) {
+            item.insertAdjacentHTML('beforebegin', html);
+            item.remove();
+        })
+        .catch(function() {
+            window.location.href = link.href;
+        });
+});
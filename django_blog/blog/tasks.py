@@ -0,0 +1,51 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .routers import use_primary
+
+# Minimal background task runner.
+# Tasks are queued once the current transaction commits, so they always see the
+# rows the request wrote. BLOG_TASK_RUNNER = 'thread' runs them on an in-process
+# thread pool; 'sync' runs them inline, which is what the tests use.
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BLOG_TASK_WORKERS', 2),
+                thread_name_prefix='blog-task',
+            )
+    return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        # Tasks run right after the write that queued them; replicas may not have it yet
+        with use_primary():
+            func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', func.__name__)
+    finally:
+        # Worker threads hold their own connections; don't leave them open between tasks
+        connections.close_all()
+
+
+def enqueue(func, *args, **kwargs):
+    """Run func(*args, **kwargs) in the background after the current transaction commits."""
+    def submit():
+        if getattr(settings, 'BLOG_TASK_RUNNER', 'thread') == 'sync':
+            func(*args, **kwargs)
+        else:
+            _get_executor().submit(_run, func, args, kwargs)
+    transaction.on_commit(submit)
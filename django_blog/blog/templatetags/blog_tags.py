@@ -0,0 +1,18 @@
+from django import template
+from django.core.files.storage import default_storage
+from ..images import RENDITION_SIZES, rendition_name
+
+register = template.Library()
+
+
+@register.filter
+def profile_picture_url(profile, size='medium'):
+    """URL of a profile picture rendition, falling back to the original until it is processed.
+
+    Usage: {{ profile|profile_picture_url:"small" }}
+    """
+    if not profile or not profile.profile_picture:
+        return ''
+    if size in RENDITION_SIZES and profile.profile_picture_processed_at:
+        return default_storage.url(rendition_name(profile.profile_picture.name, size))
+    return profile.profile_picture.url
@@ -1,9 +1,47 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
+from unittest import skipUnless
+from django.conf import settings
+from django.db import router
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.contenttypes.models import ContentType
+from django.http import Http404
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, RequestFactory, override_settings
+from unittest import mock
+from xml.etree import ElementTree
+from django.http import HttpResponse
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, connections
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from io import StringIO
+from blog.images import RENDITION_SIZES, rendition_name, process_profile_picture
+from blog.routers import PrimaryStickinessMiddleware, use_primary
+from blog.profiling import QueryBudgetExceeded, QueryProfile, QueryProfilingMiddleware, query_budget
 from django.contrib.auth.models import User
 from django.urls import reverse
-from blog.models import Post
+from blog.models import Post, PostDailyViews, Comment, Profile, TagStat
+from datetime import timedelta
+from django.utils import timezone
+from django.utils.http import http_date
+from blog import counters, feeds, views
 
-class PostCRUDTests(TestCase):
+class DropBufferedViews:
+    """Drops the page views a test leaves buffered, which would otherwise be flushed into whatever database is there next."""
+
+    def tearDown(self):
+        counters._pending.clear()
+        super().tearDown()
+
+
+class PostCRUDTests(DropBufferedViews, TestCase):
 
     def setUp(self):
         # Create a test user with your registration details
@@ -105,3 +143,1215 @@ class PostCRUDTests(TestCase):
         response = self.client.get(reverse('register'))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, "Register")
+
+
+class PostSearchTests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="searcher", password="supersecret")
+        self.title_match = Post.objects.create(
+            title="Django performance", content="Notes on caching.", author=self.user
+        )
+        self.content_match = Post.objects.create(
+            title="Weekly notes", content="Some django tips.", author=self.user
+        )
+        self.tag_match = Post.objects.create(
+            title="Untitled", content="Nothing here.", author=self.user
+        )
+        self.tag_match.tags.add("django")
+        self.other = Post.objects.create(
+            title="Gardening", content="Tomatoes.", author=self.user
+        )
+
+    def test_search_matches_title_content_and_tags(self):
+        response = self.client.get(reverse('post-search'), {'q': 'django'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(response.context['posts']),
+            {self.title_match, self.content_match, self.tag_match},
+        )
+
+    def test_search_ranks_title_matches_first(self):
+        response = self.client.get(reverse('post-search'), {'q': 'django'})
+        posts = list(response.context['posts'])
+        self.assertEqual(posts[0], self.title_match)
+        self.assertEqual(posts[1], self.tag_match)
+
+    def test_search_without_query_lists_all_posts(self):
+        response = self.client.get(reverse('post-search'))
+        self.assertEqual(len(response.context['posts']), 4)
+
+
+class PostPaginationTests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="pager", password="supersecret")
+        self.posts = [
+            Post.objects.create(title=f"Post {i}", content="Paged content.", author=self.user)
+            for i in range(25)
+        ]
+        # Newest first, matching the list ordering
+        self.posts.reverse()
+
+    def test_first_page_is_bounded(self):
+        response = self.client.get(reverse('post-list'))
+        self.assertEqual(list(response.context['posts']), self.posts[:10])
+        self.assertTrue(response.context['is_paginated'])
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_next_and_previous_cursors(self):
+        first = self.client.get(reverse('post-list')).context['page_obj']
+        second = self.client.get(reverse('post-list'), {'cursor': first.next_cursor}).context['page_obj']
+        self.assertEqual(list(second), self.posts[10:20])
+        third = self.client.get(reverse('post-list'), {'cursor': second.next_cursor}).context['page_obj']
+        self.assertEqual(list(third), self.posts[20:])
+        self.assertFalse(third.has_next())
+        back = self.client.get(reverse('post-list'), {'cursor': third.previous_cursor}).context['page_obj']
+        self.assertEqual(list(back), self.posts[10:20])
+
+    def test_posts_with_same_published_date_are_not_skipped(self):
+        Post.objects.update(published_date=self.posts[0].published_date)
+        seen = []
+        cursor = None
+        while True:
+            params = {'cursor': cursor} if cursor else {}
+            page = self.client.get(reverse('post-list'), params).context['page_obj']
+            seen.extend(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+    def test_tag_list_is_paginated(self):
+        for post in self.posts:
+            post.tags.add("paged")
+        response = self.client.get(reverse('posts-by-tag', args=['paged']))
+        self.assertEqual(len(response.context['posts']), 10)
+        self.assertTrue(response.context['page_obj'].has_next())
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('post-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class QueryCountTests(DropBufferedViews, TestCase):
+    """The number of queries per page must not grow with the number of rows."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="counter", password="supersecret")
+
+    def create_posts(self, count, comments=0):
+        posts = []
+        for i in range(count):
+            author = User.objects.create_user(username=f"author{Post.objects.count()}")
+            post = Post.objects.create(title=f"Post {i}", content="Counted.", author=author)
+            post.tags.add("django", f"tag-{i}")
+            for j in range(comments):
+                commenter = User.objects.create_user(username=f"commenter{post.pk}-{j}")
+                Comment.objects.create(post=post, author=commenter, content=f"Comment {j}")
+            posts.append(post)
+        return posts
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_post_list_query_count_is_constant(self):
+        self.create_posts(1)
+        few = self.count_queries(reverse('post-list'))
+        self.create_posts(5)
+        many = self.count_queries(reverse('post-list'))
+        self.assertEqual(few, many)
+
+    def test_posts_by_tag_query_count_is_constant(self):
+        self.create_posts(1)
+        few = self.count_queries(reverse('posts-by-tag', args=['django']))
+        self.create_posts(5)
+        many = self.count_queries(reverse('posts-by-tag', args=['django']))
+        self.assertEqual(few, many)
+
+    def test_post_detail_query_count_is_constant(self):
+        quiet, busy = self.create_posts(1, comments=1) + self.create_posts(1, comments=6)
+        self.assertEqual(
+            self.count_queries(reverse('post-detail', args=[quiet.pk])),
+            self.count_queries(reverse('post-detail', args=[busy.pk])),
+        )
+
+    def test_post_detail_query_count_for_logged_in_user(self):
+        post, = self.create_posts(1, comments=6)
+        self.client.login(username="counter", password="supersecret")
+        # freshness check, session, user, post with author, tags, comments with authors
+        with self.assertNumQueries(6):
+            self.client.get(reverse('post-detail', args=[post.pk]))
+
+
+class FragmentCacheTests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="cacher", password="supersecret")
+        self.post = Post.objects.create(title="Cached post", content="Cached content.", author=self.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, len(queries)
+
+    def test_post_detail_is_served_from_cache(self):
+        url = reverse('post-detail', args=[self.post.pk])
+        _, cold = self.count_queries(url)
+        response, warm = self.count_queries(url)
+        self.assertLess(warm, cold)
+        self.assertContains(response, "Cached content.")
+
+    def test_new_comment_invalidates_post_detail(self):
+        url = reverse('post-detail', args=[self.post.pk])
+        self.client.get(url)
+        Comment.objects.create(post=self.post, author=self.user, content="Fresh comment")
+        self.assertContains(self.client.get(url), "Fresh comment")
+
+    def test_post_update_invalidates_post_detail_and_list(self):
+        self.client.get(reverse('post-detail', args=[self.post.pk]))
+        self.client.get(reverse('post-list'))
+        self.post.content = "Edited content."
+        self.post.save()
+        self.assertContains(self.client.get(reverse('post-detail', args=[self.post.pk])), "Edited content.")
+        self.assertContains(self.client.get(reverse('post-list')), "Edited content.")
+
+    def test_post_list_skips_queries_when_cached(self):
+        url = reverse('post-list')
+        _, cold = self.count_queries(url)
+        _, warm = self.count_queries(url)
+        self.assertEqual(warm, cold - 2)  # no page query, no tag prefetch
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'django_blog_test_cache'),
+    }})
+    def test_works_with_file_based_cache(self):
+        cache.clear()
+        url = reverse('post-detail', args=[self.post.pk])
+        self.client.get(url)
+        Comment.objects.create(post=self.post, author=self.user, content="File cached comment")
+        self.assertContains(self.client.get(url), "File cached comment")
+        cache.clear()
+
+
+class CommentStatsTests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="stats", password="supersecret")
+        self.quiet = Post.objects.create(title="Quiet", content="No comments.", author=self.user)
+        self.busy = Post.objects.create(title="Busy", content="Many comments.", author=self.user)
+        self.newest = Post.objects.create(title="Newest", content="Just published.", author=self.user)
+
+    def test_comment_create_and_delete_update_stats(self):
+        self.client.login(username="stats", password="supersecret")
+        self.client.post(reverse('comment-create', args=[self.busy.pk]), {'content': "First"})
+        self.client.post(reverse('comment-create', args=[self.busy.pk]), {'content': "Second"})
+        self.busy.refresh_from_db()
+        self.assertEqual(self.busy.comment_count, 2)
+        latest = Comment.objects.get(content="Second")
+        self.assertEqual(self.busy.last_comment_at, latest.created_at)
+
+        self.client.post(reverse('comment-delete', args=[self.busy.pk, latest.pk]))
+        self.busy.refresh_from_db()
+        self.assertEqual(self.busy.comment_count, 1)
+        self.assertEqual(self.busy.last_comment_at, Comment.objects.get(content="First").created_at)
+
+    def test_deleting_a_post_does_not_update_it_per_comment(self):
+        def deletion_queries(post, comments):
+            for i in range(comments):
+                Comment.objects.create(post=post, author=self.user, content=f"Comment {i}")
+            with CaptureQueriesContext(connection) as queries:
+                post.delete()
+            return len(queries)
+
+        ContentType.objects.get_for_model(Post)  # cached per process outside the tests
+        few = deletion_queries(self.busy, 2)
+        self.assertEqual(deletion_queries(self.quiet, 20), few)
+        self.assertFalse(Comment.objects.exists())
+
+        # Deleting a user deletes their posts, and still updates the other posts they commented on
+        other = User.objects.create_user(username="other", password="supersecret")
+        own = Post.objects.create(title="Own", content="Mine.", author=other)
+        Comment.objects.create(post=own, author=other, content="On my post")
+        Comment.objects.create(post=self.newest, author=other, content="On another post")
+        other.delete()
+        self.newest.refresh_from_db()
+        self.assertEqual(self.newest.comment_count, 0)
+        self.assertIsNone(self.newest.last_comment_at)
+
+    def test_rebuild_post_stats_command(self):
+        Comment.objects.create(post=self.busy, author=self.user, content="One")
+        Comment.objects.create(post=self.busy, author=self.user, content="Two")
+        Post.objects.update(comment_count=0, last_comment_at=None)
+        call_command('rebuild_post_stats', batch_size=2, stdout=StringIO())
+        self.busy.refresh_from_db()
+        self.quiet.refresh_from_db()
+        self.assertEqual(self.busy.comment_count, 2)
+        self.assertIsNotNone(self.busy.last_comment_at)
+        self.assertEqual(self.quiet.comment_count, 0)
+        self.assertIsNone(self.quiet.last_comment_at)
+
+    def test_post_list_ordering_options(self):
+        Comment.objects.create(post=self.busy, author=self.user, content="One")
+        Comment.objects.create(post=self.busy, author=self.user, content="Two")
+        Comment.objects.create(post=self.quiet, author=self.user, content="Latest")
+        url = reverse('post-list')
+        self.assertEqual(list(self.client.get(url).context['posts']), [self.newest, self.busy, self.quiet])
+        self.assertEqual(
+            list(self.client.get(url, {'order': 'discussed'}).context['posts']),
+            [self.busy, self.quiet, self.newest],
+        )
+        self.assertEqual(
+            list(self.client.get(url, {'order': 'active'}).context['posts']),
+            [self.quiet, self.busy, self.newest],
+        )
+
+    def test_ordering_is_kept_across_pages(self):
+        for i in range(12):
+            Comment.objects.create(post=self.busy, author=self.user, content=f"Comment {i}")
+        for i in range(12):
+            Post.objects.create(title=f"Filler {i}", content="Filler.", author=self.user)
+        first = self.client.get(reverse('post-list'), {'order': 'discussed'}).context['page_obj']
+        self.assertEqual(first.object_list[0], self.busy)
+        second = self.client.get(
+            reverse('post-list'), {'order': 'discussed', 'cursor': first.next_cursor}
+        ).context['page_obj']
+        seen = list(first) + list(second)
+        self.assertEqual(len(set(seen)), 15)
+
+
+class TagStatTests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="tagger", password="supersecret")
+        self.first = Post.objects.create(title="First", content="One.", author=self.user)
+        self.second = Post.objects.create(title="Second", content="Two.", author=self.user)
+
+    def stat(self, name):
+        return TagStat.objects.filter(tag__name=name).first()
+
+    def test_stats_follow_tag_changes(self):
+        self.first.tags.add("django", "python")
+        self.second.tags.add("django")
+        self.assertEqual(self.stat("django").post_count, 2)
+        self.assertEqual(self.stat("django").latest_post_at, self.second.published_date)
+        self.assertEqual(self.stat("python").post_count, 1)
+
+        self.second.tags.remove("django")
+        self.assertEqual(self.stat("django").post_count, 1)
+        self.assertEqual(self.stat("django").latest_post_at, self.first.published_date)
+
+        self.first.tags.clear()
+        self.assertIsNone(self.stat("django"))
+        self.assertIsNone(self.stat("python"))
+
+    def test_stats_follow_post_deletion(self):
+        self.first.tags.add("django")
+        self.second.tags.add("django")
+        self.second.delete()
+        self.assertEqual(self.stat("django").post_count, 1)
+
+    def test_rebuild_tag_stats_command(self):
+        self.first.tags.add("django")
+        TagStat.objects.all().delete()
+        call_command('rebuild_tag_stats', stdout=StringIO())
+        self.assertEqual(self.stat("django").post_count, 1)
+
+    def test_tag_cloud_is_cached_until_tags_change(self):
+        self.first.tags.add("django")
+        url = reverse('tag-cloud')
+        self.assertContains(self.client.get(url), "django")
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        self.second.tags.add("python")
+        self.assertContains(self.client.get(url), "python")
+
+
+class ProfileWriteTests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="profiled", password="supersecret")
+
+    def profile_queries(self, queries):
+        return [query['sql'] for query in queries.captured_queries if 'blog_profile' in query['sql']]
+
+    def test_registration_creates_profile(self):
+        self.client.post(reverse('register'), {
+            'username': "newcomer",
+            'email': "newcomer@example.com",
+            'password1': "Str0ng-pass-phrase",
+            'password2': "Str0ng-pass-phrase",
+        })
+        self.assertTrue(Profile.objects.filter(user__username="newcomer").exists())
+
+    def test_login_does_not_touch_profile(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('login'), {'username': "profiled", 'password': "supersecret"})
+        self.assertIn('_auth_user_id', self.client.session)
+        self.assertEqual(self.profile_queries(queries), [])
+
+    def test_unchanged_profile_is_not_saved(self):
+        self.client.login(username="profiled", password="supersecret")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('profile'), {'email': "", 'first_name': "", 'last_name': "", 'bio': ""})
+        self.assertFalse(any(sql.startswith('UPDATE') for sql in self.profile_queries(queries)))
+
+    def test_missing_profile_is_created_when_the_form_is_saved(self):
+        Profile.objects.filter(user=self.user).delete()
+        self.client.login(username="profiled", password="supersecret")
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+        self.assertFalse(Profile.objects.filter(user=self.user).exists())
+
+        self.client.post(reverse('profile'), {'email': "", 'first_name': "", 'last_name': "", 'bio': ""})
+        self.assertTrue(Profile.objects.filter(user=self.user).exists())
+
+    def test_changed_profile_is_saved(self):
+        self.client.login(username="profiled", password="supersecret")
+        self.client.post(reverse('profile'), {'email': "", 'first_name': "", 'last_name': "", 'bio': "Hello"})
+        self.assertEqual(Profile.objects.get(user=self.user).bio, "Hello")
+
+
+@override_settings(BLOG_TASK_RUNNER='sync')
+class ProfilePictureProcessingTests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(username="pictured", password="supersecret")
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        super().tearDown()
+
+    def upload(self, size=(2000, 1500)):
+        exif = Image.Exif()
+        exif[0x010F] = "Camera maker"  # Make
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, format='JPEG', exif=exif)
+        return SimpleUploadedFile("avatar.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+    def test_profile_upload_is_processed_after_commit(self):
+        self.client.login(username="pictured", password="supersecret")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('profile'), {
+                'email': "", 'first_name': "", 'last_name': "", 'bio': "",
+                'profile_picture': self.upload(),
+            })
+        profile = Profile.objects.get(user=self.user)
+        self.assertIsNotNone(profile.profile_picture_processed_at)
+
+        with default_storage.open(profile.profile_picture.name) as picture:
+            original = Image.open(picture)
+            self.assertLessEqual(max(original.size), 1024)
+            self.assertEqual(len(original.getexif()), 0)
+        for label, size in RENDITION_SIZES.items():
+            with default_storage.open(rendition_name(profile.profile_picture.name, label)) as picture:
+                self.assertEqual(max(Image.open(picture).size), size)
+
+        response = self.client.get(reverse('profile'))
+        self.assertContains(response, rendition_name(profile.profile_picture.name, 'medium'))
+
+    def test_unprocessed_picture_falls_back_to_original(self):
+        profile = Profile.objects.get(user=self.user)
+        profile.profile_picture = self.upload()
+        profile.save()
+        self.client.login(username="pictured", password="supersecret")
+        self.assertContains(self.client.get(reverse('profile')), profile.profile_picture.url)
+        process_profile_picture(profile.pk)
+        profile.refresh_from_db()
+        self.assertIsNotNone(profile.profile_picture_processed_at)
+
+
+class PostImportExportTests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="writer", password="supersecret")
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+        super().tearDown()
+
+    def path(self, name):
+        return os.path.join(self.workdir, name)
+
+    def test_jsonl_import_in_batches(self):
+        with open(self.path("posts.jsonl"), "w") as stream:
+            for i in range(5):
+                stream.write(json.dumps({
+                    'title': f"Imported {i}",
+                    'content': "Imported content.",
+                    'author': "writer",
+                    'published_date': f"2024-01-0{i + 1}T12:00:00+00:00",
+                    'tags': ["imported", f"batch-{i % 2}"],
+                    'comments': [{'author': "writer", 'content': "Hi", 'created_at': "2024-02-01T00:00:00+00:00"}],
+                }) + "\n")
+        call_command('import_posts', self.path("posts.jsonl"), batch_size=2, stdout=StringIO())
+
+        self.assertEqual(Post.objects.count(), 5)
+        post = Post.objects.get(title="Imported 3")
+        self.assertEqual(post.published_date.day, 4)
+        self.assertEqual(sorted(post.tags.names()), ["batch-1", "imported"])
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(post.last_comment_at.month, 2)
+        self.assertEqual(TagStat.objects.get(tag__name="imported").post_count, 5)
+        self.assertEqual(TagStat.objects.get(tag__name="batch-0").post_count, 3)
+
+    def test_csv_import_and_unknown_authors(self):
+        with open(self.path("posts.csv"), "w", newline="") as stream:
+            stream.write("title,content,author,published_date,tags\n")
+            stream.write('From CSV,Body,stranger,,"one, two"\n')
+        with self.assertRaises(CommandError):
+            call_command('import_posts', self.path("posts.csv"), stdout=StringIO())
+        self.assertFalse(Post.objects.exists())
+
+        call_command('import_posts', self.path("posts.csv"), create_authors=True, stdout=StringIO())
+        post = Post.objects.get(title="From CSV")
+        self.assertEqual(post.author.username, "stranger")
+        self.assertEqual(sorted(post.tags.names()), ["one", "two"])
+
+    def test_export_then_import_round_trip(self):
+        post = Post.objects.create(title="Round trip", content="Body.", author=self.user)
+        post.tags.add("travel")
+        Comment.objects.create(post=post, author=self.user, content="Nice")
+        Comment.objects.create(post=post, author=self.user, content="Held back", is_approved=False)
+        call_command('export_posts', self.path("out.jsonl"), chunk_size=1, stdout=StringIO())
+        call_command('export_posts', self.path("out.csv"), stdout=StringIO())
+
+        with open(self.path("out.jsonl")) as stream:
+            records = [json.loads(line) for line in stream]
+        self.assertEqual(records[0]['tags'], ["travel"])
+        self.assertEqual(records[0]['comments'][0]['content'], "Nice")
+        self.assertEqual([comment['is_approved'] for comment in records[0]['comments']], [True, False])
+        with open(self.path("out.csv")) as stream:
+            self.assertIn("Round trip", stream.read())
+
+        Post.objects.all().delete()
+        call_command('import_posts', self.path("out.jsonl"), stdout=StringIO())
+        imported = Post.objects.get(title="Round trip")
+        self.assertEqual(imported.published_date, post.published_date)
+        self.assertEqual(imported.comments.get(is_approved=True).content, "Nice")
+        # Moderated comments stay unpublished, and out of the post's comment stats
+        self.assertEqual(imported.comments.get(is_approved=False).content, "Held back")
+        self.assertEqual(imported.comment_count, 1)
+
+
+class ConditionalGetTests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="etagger", password="supersecret")
+        self.post = Post.objects.create(title="Validated", content="Cacheable content.", author=self.user)
+        self.url = reverse('post-detail', args=[self.post.pk])
+
+    def test_unchanged_post_detail_returns_304_after_one_query(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_post_detail_etag_changes_with_content_and_comments(self):
+        etag = self.client.get(self.url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user, content="New comment")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        Post.objects.filter(pk=self.post.pk).update(content="Silently edited.")
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_deleting_the_latest_comment_is_not_a_304(self):
+        Comment.objects.create(post=self.post, author=self.user, content="Older comment")
+        latest = Comment.objects.create(post=self.post, author=self.user, content="Latest comment")
+        response = self.client.get(self.url)
+        self.assertNotIn('Last-Modified', response)
+
+        latest.delete()
+        self.assertNotContains(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']), "Latest comment")
+        # A client that only sends If-Modified-Since gets the page again
+        since = http_date((timezone.now() + timedelta(hours=1)).timestamp())
+        self.assertNotContains(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=since), "Latest comment")
+
+    def test_etag_differs_per_visitor(self):
+        anonymous_etag = self.client.get(self.url)['ETag']
+        self.client.login(username="etagger", password="supersecret")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=anonymous_etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unchanged_post_list_returns_304_without_queries(self):
+        url = reverse('post-list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.post.tags.add("fresh")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_post_is_still_404(self):
+        self.assertEqual(self.client.get(reverse('post-detail', args=[self.post.pk + 1])).status_code, 404)
+
+
+@override_settings(BLOG_READ_REPLICAS=['replica_a', 'replica_b'])
+class ReadReplicaRouterTests(DropBufferedViews, TestCase):
+
+    def route_read_in_request(self, cookies=None, write=False):
+        """Route a Post read inside a request handled by PrimaryStickinessMiddleware."""
+        routed = {}
+
+        def view(request):
+            if write:
+                router.db_for_write(Post)
+            routed['read'] = router.db_for_read(Post)
+            routed['user_read'] = router.db_for_read(User)
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        response = PrimaryStickinessMiddleware(view)(request)
+        return routed, response
+
+    def test_blog_reads_go_to_replicas(self):
+        routed, response = self.route_read_in_request()
+        self.assertIn(routed['read'], ['replica_a', 'replica_b'])
+        self.assertEqual(routed['user_read'], 'default')  # auth is not replicated
+        self.assertNotIn(PrimaryStickinessMiddleware.cookie_name, response.cookies)
+
+    def test_writes_go_to_primary_and_pin_reads(self):
+        routed, response = self.route_read_in_request(write=True)
+        self.assertEqual(routed['read'], 'default')
+        self.assertIn(PrimaryStickinessMiddleware.cookie_name, response.cookies)
+
+    def test_sticky_cookie_pins_reads_to_primary(self):
+        routed, _ = self.route_read_in_request(cookies={PrimaryStickinessMiddleware.cookie_name: '1'})
+        self.assertEqual(routed['read'], 'default')
+
+    def test_use_primary_block(self):
+        with use_primary():
+            self.assertEqual(router.db_for_read(Post), 'default')
+
+
+# Runs when a non-mirrored replica alias is configured (e.g. a second SQLite file),
+# so that reads which reach the replica visibly miss rows written to the primary.
+REPLICA_STAND_INS = [
+    alias for alias in getattr(settings, 'BLOG_READ_REPLICAS', [])
+    if not settings.DATABASES[alias].get('TEST', {}).get('MIRROR')
+]
+
+
+@skipUnless(REPLICA_STAND_INS, "needs a non-mirrored replica database")
+class ReadReplicaStandInTests(DropBufferedViews, TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="replicated", password="supersecret")
+        self.post = Post.objects.create(title="Primary only", content="Not replicated.", author=self.user)
+
+    def test_reads_use_replica_until_the_user_writes(self):
+        with override_settings(BLOG_READ_REPLICAS=REPLICA_STAND_INS):
+            url = reverse('post-detail', args=[self.post.pk])
+            self.assertEqual(self.client.get(url).status_code, 404)  # the replica has not caught up
+
+            self.client.login(username="replicated", password="supersecret")
+            self.client.post(reverse('comment-create', args=[self.post.pk]), {'content': "Mine"})
+            self.assertContains(self.client.get(url), "Mine")
+
+
+# Always there: a replica alias that the test runner points at the test database
+# (TEST MIRROR), so the router's choices can be seen in which connection runs the
+# queries. Declared before the runner sets up the test databases, which happens
+# after the test modules are imported.
+MIRRORED_REPLICA = 'test_replica'
+if MIRRORED_REPLICA not in settings.DATABASES:
+    settings.DATABASES[MIRRORED_REPLICA] = {**settings.DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    connections.settings[MIRRORED_REPLICA] = connections.configure_settings(settings.DATABASES)[MIRRORED_REPLICA]
+
+
+@override_settings(BLOG_READ_REPLICAS=[MIRRORED_REPLICA])
+class ReadReplicaMirrorTests(DropBufferedViews, TransactionTestCase):
+    # Committed rows, since the mirror reads through a connection of its own
+    databases = {'default', MIRRORED_REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="mirrored", password="supersecret")
+        self.post = Post.objects.create(title="Mirrored", content="On both.", author=self.user)
+        self.url = reverse('post-detail', args=[self.post.pk])
+
+    def blog_reads(self):
+        """Get the post page; return the blog_post queries run on the primary and on the replica."""
+        with CaptureQueriesContext(connection) as primary, \
+                CaptureQueriesContext(connections[MIRRORED_REPLICA]) as replica:
+            self.assertContains(self.client.get(self.url), "Mirrored")
+        return [
+            [query['sql'] for query in captured if 'FROM "blog_post"' in query['sql']]
+            for captured in (primary, replica)
+        ]
+
+    def test_reads_go_to_the_replica_until_the_user_writes(self):
+        on_primary, on_replica = self.blog_reads()
+        self.assertFalse(on_primary)
+        self.assertTrue(on_replica)
+
+        self.client.login(username="mirrored", password="supersecret")
+        response = self.client.post(reverse('comment-create', args=[self.post.pk]), {'content': "Mine"})
+        self.assertIn(PrimaryStickinessMiddleware.cookie_name, response.cookies)
+
+        # Right after the write, the user's reads stay on the primary
+        on_primary, on_replica = self.blog_reads()
+        self.assertTrue(on_primary)
+        self.assertFalse(on_replica)
+
+    def test_viewing_the_profile_page_is_not_a_write(self):
+        self.client.login(username="mirrored", password="supersecret")
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(PrimaryStickinessMiddleware.cookie_name, response.cookies)
+
+
+class QueryProfilingTests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="profiled", password="supersecret")
+        self.post = Post.objects.create(title="Profiled post", content="Counted.", author=self.user)
+
+    def run_greedy_view(self):
+        @query_budget(1)
+        def greedy(request):
+            return HttpResponse(f'{Post.objects.count()} {User.objects.count()}')
+
+        def get_response(request):
+            middleware.process_view(request, greedy, (), {})
+            return greedy(request)
+
+        middleware = QueryProfilingMiddleware(get_response)
+        return middleware(RequestFactory().get('/greedy/'))
+
+    @override_settings(DEBUG=True)
+    def test_debug_responses_carry_the_profile_header(self):
+        response = self.client.get(reverse('post-detail', args=[self.post.pk]))
+        self.assertRegex(response['X-Query-Profile'], r'^count=\d+; time=[\d.]+ms; duplicates=0$')
+
+    @override_settings(DEBUG=False, QUERY_BUDGETS_ENFORCE=False)
+    def test_production_logs_one_json_line_per_request(self):
+        with self.assertLogs('blog.queries', 'INFO') as logs:
+            response = self.client.get(reverse('post-detail', args=[self.post.pk]))
+        self.assertNotIn('X-Query-Profile', response)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'post-detail')
+        self.assertEqual(record['budget'], 6)
+        self.assertGreater(record['queries'], 0)
+        self.assertLessEqual(len(record['slowest']), 3)
+
+    def test_duplicate_queries_are_counted(self):
+        profile = QueryProfile()
+        with connection.execute_wrapper(profile):
+            for _ in range(3):
+                Post.objects.filter(pk=self.post.pk).exists()
+            Post.objects.filter(pk=0).exists()
+        self.assertEqual(profile.count, 4)
+        self.assertEqual(profile.duplicates, 2)
+
+    @override_settings(QUERY_BUDGETS_ENFORCE=True)
+    def test_exceeding_a_budget_fails(self):
+        with self.assertLogs('blog.queries', 'WARNING'), self.assertRaises(QueryBudgetExceeded):
+            self.run_greedy_view()
+
+    @override_settings(QUERY_BUDGETS_ENFORCE=False)
+    def test_exceeding_a_budget_in_production_logs_a_warning(self):
+        with self.assertLogs('blog.queries', 'WARNING'):
+            self.assertEqual(self.run_greedy_view().status_code, 200)
+
+    @override_settings(QUERY_BUDGETS_ENFORCE=True)
+    def test_tag_views_fit_their_budgets_in_a_fresh_process(self):
+        # A new process hasn't cached the Post content type that tagged_post_ids() looks up
+        self.post.tags.add("django")
+        self.client.login(username="profiled", password="supersecret")
+        for url in (
+            reverse('posts-by-tag', args=['django']),
+            reverse('post-search') + '?q=django',
+            reverse('tag-feed', args=['django', 'rss']),
+        ):
+            with self.subTest(url=url):
+                cache.clear()
+                ContentType.objects.clear_cache()
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class AsyncReadViewTests(DropBufferedViews, TestCase):
+    """The async read views must render exactly what their sync counterparts do."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="asyncauthor", password="supersecret")
+        self.post = Post.objects.create(title="Async post", content="Served from the event loop.", author=self.user)
+        self.post.tags.add("django")
+        Comment.objects.create(post=self.post, author=self.user, content="Awaited comment")
+        ContentType.objects.clear_cache()  # the views must not need it warm
+
+    async def render_async(self, view, path, headers=None, **kwargs):
+        request = AsyncRequestFactory().get(path, headers=headers)
+
+        async def auser():
+            return AnonymousUser()
+
+        request.auser = auser
+        response = await view.as_view()(request, **kwargs)
+        if hasattr(response, 'render'):
+            await sync_to_async(response.render)()
+        return response
+
+    def render_sync(self, view, path, **kwargs):
+        request = RequestFactory().get(path)
+        request.user = AnonymousUser()
+        return view.as_view()(request, **kwargs).render()
+
+    async def assert_same_page(self, sync_view, async_view, path, **kwargs):
+        async_response = await self.render_async(async_view, path, **kwargs)
+        await sync_to_async(cache.clear)()
+        sync_response = await sync_to_async(self.render_sync)(sync_view, path, **kwargs)
+        self.assertEqual(async_response.status_code, 200)
+        self.assertEqual(async_response.content, sync_response.content)
+
+    async def test_pages_match_the_sync_views(self):
+        await self.assert_same_page(views.PostListView, views.AsyncPostListView, reverse('post-list'))
+        await self.assert_same_page(views.PostListView, views.AsyncPostListView, reverse('post-list') + '?order=active')
+        await self.assert_same_page(
+            views.PostByTagListView, views.AsyncPostByTagListView, reverse('posts-by-tag', args=['django']), tag_slug='django'
+        )
+        await self.assert_same_page(
+            views.PostDetailView, views.AsyncPostDetailView, reverse('post-detail', args=[self.post.pk]), pk=self.post.pk
+        )
+        await self.assert_same_page(views.PostSearchView, views.AsyncPostSearchView, reverse('post-search') + '?q=event')
+
+    def test_cached_list_fragment_skips_the_page_query(self):
+        path = reverse('post-list')
+        ContentType.objects.get_for_model(Post)
+        with self.assertNumQueries(2):  # page of posts, their tags
+            async_to_sync(self.render_async)(views.AsyncPostListView, path)
+        with self.assertNumQueries(0):
+            response = async_to_sync(self.render_async)(views.AsyncPostListView, path)
+        self.assertContains(response, "Async post")
+
+    async def test_detail_answers_conditional_requests_and_404s(self):
+        path = reverse('post-detail', args=[self.post.pk])
+        response = await self.render_async(views.AsyncPostDetailView, path, pk=self.post.pk)
+        self.assertContains(response, "Awaited comment")
+        response = await self.render_async(
+            views.AsyncPostDetailView, path, headers={'If-None-Match': response['ETag']}, pk=self.post.pk
+        )
+        self.assertEqual(response.status_code, 304)
+        with self.assertRaises(Http404):
+            await self.render_async(views.AsyncPostDetailView, reverse('post-detail', args=[0]), pk=0)
+
+
+@override_settings(BLOG_COMMENTS_PER_PAGE=2)
+class CommentPaginationTests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="chatty", password="supersecret")
+        self.post = Post.objects.create(title="Viral post", content="Everyone has an opinion.", author=self.user)
+        for i in range(5):
+            Comment.objects.create(post=self.post, author=self.user, content=f"Opinion {i}")
+
+    def test_post_page_renders_only_the_first_page(self):
+        response = self.client.get(reverse('post-detail', args=[self.post.pk]))
+        self.assertContains(response, "Opinion 4")
+        self.assertContains(response, "Opinion 3")
+        self.assertNotContains(response, "Opinion 2")
+        self.assertContains(response, reverse('comment-list', args=[self.post.pk]) + "?cursor=")
+
+    def test_load_more_walks_through_every_comment_once(self):
+        url = reverse('post-detail', args=[self.post.pk])
+        cursor = self.client.get(url).context['comments'].next_cursor
+        seen = []
+        while cursor:
+            data = self.client.get(reverse('comment-list', args=[self.post.pk]), {'cursor': cursor, 'format': 'json'}).json()
+            seen += [comment['content'] for comment in data['comments']]
+            cursor = data['next_cursor']
+        self.assertEqual(seen, ["Opinion 2", "Opinion 1", "Opinion 0"])
+
+    def test_fragment_and_json_formats(self):
+        first = self.client.get(reverse('comment-list', args=[self.post.pk]))
+        self.assertTemplateUsed(first, 'blog/_comment_list.html')
+        self.assertNotContains(first, "<html")
+        self.assertContains(first, "Opinion 4")
+        self.assertContains(first, "Load more comments")
+
+        response = self.client.get(reverse('comment-list', args=[self.post.pk]), HTTP_ACCEPT='application/json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(self.client.get(reverse('comment-list', args=[self.post.pk]), {'cursor': "bogus"}).status_code, 404)
+
+
+FEED_TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'feed-tests-default'},
+    'feeds': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'feed-tests'},
+}
+
+
+@override_settings(CACHES=FEED_TEST_CACHES, BLOG_SITEMAP_SECTION_SIZE=2)
+class FeedTests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="syndicated", password="supersecret")
+        self.posts = [Post.objects.create(title=f"Feed post {i}", content=f"Body <{i}>", author=self.user) for i in range(3)]
+        self.posts[0].tags.add("django")
+
+    def test_rss_and_atom_feeds(self):
+        rss = self.client.get(reverse('post-feed', args=['rss']))
+        self.assertEqual(rss['Content-Type'], 'application/rss+xml; charset=utf-8')
+        items = ElementTree.fromstring(rss.content).findall('channel/item')
+        self.assertEqual([item.findtext('title') for item in items], ["Feed post 2", "Feed post 1", "Feed post 0"])
+        self.assertEqual(items[0].findtext('link'), 'http://testserver' + self.posts[2].get_absolute_url())
+
+        atom = self.client.get(reverse('post-feed', args=['atom']))
+        entries = ElementTree.fromstring(atom.content).findall('{http://www.w3.org/2005/Atom}entry')
+        self.assertEqual(len(entries), 3)
+        self.assertEqual(self.client.get(reverse('post-feed', args=['json'])).status_code, 404)
+
+    def test_tag_feed(self):
+        response = self.client.get(reverse('tag-feed', args=['django', 'rss']))
+        items = ElementTree.fromstring(response.content).findall('channel/item')
+        self.assertEqual([item.findtext('title') for item in items], ["Feed post 0"])
+        self.assertEqual([c.text for c in items[0].findall('category')], ["django"])
+        self.assertEqual(self.client.get(reverse('tag-feed', args=['missing', 'rss'])).status_code, 404)
+
+    def test_unchanged_feed_returns_304_after_one_query(self):
+        url = reverse('post-feed', args=['rss'])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.posts[1].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_only_new_posts_are_rendered(self):
+        url = reverse('post-feed', args=['atom'])
+        self.client.get(url)
+        new_post = Post.objects.create(title="Feed post 3", content="Fresh", author=self.user)
+        with mock.patch('blog.feeds.render_entry', wraps=feeds.render_entry) as render:
+            response = self.client.get(url)
+        self.assertEqual([call.args[1].pk for call in render.call_args_list], [new_post.pk])
+        self.assertContains(response, "Feed post 3")
+        self.assertContains(response, "Feed post 0")
+
+        # Nothing changed: the whole document comes from the cache
+        with mock.patch('blog.feeds.render_entry') as render, self.assertNumQueries(1):
+            self.client.get(url)
+        render.assert_not_called()
+
+    def test_sitemap(self):
+        index = ElementTree.fromstring(self.client.get(reverse('sitemap')).content)
+        namespace = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+        sections = [loc.text for loc in index.iter(namespace + 'loc')]
+        self.assertEqual(len(sections), 2)
+
+        urls = []
+        for section in sections:
+            response = self.client.get(section.removeprefix('http://testserver'))
+            urls += [loc.text for loc in ElementTree.fromstring(response.content).iter(namespace + 'loc')]
+        self.assertEqual(urls, ['http://testserver' + post.get_absolute_url() for post in self.posts])
+        self.assertEqual(self.client.get(reverse('sitemap-section', args=[3])).status_code, 404)
+
+    def test_sitemap_section_changes_only_with_its_posts(self):
+        first, last = reverse('sitemap-section', args=[1]), reverse('sitemap-section', args=[2])
+        first_etag, last_etag = self.client.get(first)['ETag'], self.client.get(last)['ETag']
+        Post.objects.create(title="Feed post 3", content="Fresh", author=self.user)
+        self.assertEqual(self.client.get(first, HTTP_IF_NONE_MATCH=first_etag).status_code, 304)
+        self.assertEqual(self.client.get(last, HTTP_IF_NONE_MATCH=last_etag).status_code, 200)
+
+
+class ViewCountTests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        counters.flush_view_counts()
+        self.user = User.objects.create_user(username="popular", password="supersecret")
+        self.posts = [Post.objects.create(title=f"Counted post {i}", content="Read me.", author=self.user) for i in range(3)]
+
+    def view(self, post, times=1):
+        for _ in range(times):
+            self.client.get(reverse('post-detail', args=[post.pk]))
+
+    def test_views_are_buffered_until_flushed(self):
+        self.view(self.posts[0], 3)
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).view_count, 0)
+        self.assertEqual(counters.pending_views(), {self.posts[0].pk: 3})
+
+        self.assertEqual(counters.flush_view_counts(), 3)
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).view_count, 3)
+        self.assertEqual(counters.pending_views(), {})
+
+    def test_flush_writes_all_posts_in_a_few_statements(self):
+        for i, post in enumerate(self.posts):
+            self.view(post, i + 1)
+        # Savepoint, lock the posts, view counts, today's rows, their views, release
+        with self.assertNumQueries(6):
+            counters.flush_view_counts()
+        self.view(self.posts[0], 2)
+        counters.flush_view_counts()
+        self.assertEqual(list(Post.objects.order_by('pk').values_list('view_count', flat=True)), [3, 2, 3])
+        self.assertEqual(PostDailyViews.objects.get(post=self.posts[0]).views, 3)
+        # Counting views doesn't count as modifying the post
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).updated_at, self.posts[0].updated_at)
+
+    def test_views_are_written_when_the_process_exits(self):
+        self.view(self.posts[1], 2)
+        counters.flush_at_exit()
+        self.assertEqual(Post.objects.get(pk=self.posts[1].pk).view_count, 2)
+
+        self.view(self.posts[1])
+        with mock.patch.object(counters, '_write_views', side_effect=RuntimeError("database gone")), \
+                self.assertLogs('blog.counters', 'ERROR'):
+            counters.flush_at_exit()
+        # Kept for the next flush
+        self.assertEqual(counters.pending_views(), {self.posts[1].pk: 1})
+        counters.flush_view_counts()
+
+    def test_nothing_is_left_buffered_after_a_test(self):
+        self.view(self.posts[0])
+        self.tearDown()
+        self.assertEqual(counters.pending_views(), {})
+
+    def test_saving_a_post_keeps_counts_written_since_it_was_loaded(self):
+        post = Post.objects.get(pk=self.posts[0].pk)
+        self.view(post, 2)
+        counters.flush_view_counts()
+        Comment.objects.create(post=post, author=self.user, content="Meanwhile")
+
+        post.title = "Edited"
+        post.save()
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual((post.title, post.view_count, post.comment_count), ("Edited", 2, 1))
+        self.assertIsNotNone(post.last_comment_at)
+
+    def test_views_of_deleted_posts_are_dropped(self):
+        self.view(self.posts[0])
+        self.posts[0].delete()
+        self.assertEqual(counters.flush_view_counts(), 1)
+        self.assertFalse(PostDailyViews.objects.exists())
+
+    def test_not_modified_responses_are_not_counted(self):
+        url = reverse('post-detail', args=[self.posts[0].pk])
+        etag = self.client.get(url)['ETag']
+        self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(counters.pending_views(), {self.posts[0].pk: 1})
+
+    @override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0, BLOG_TASK_RUNNER='sync')
+    def test_flush_is_queued_once_the_interval_has_passed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.view(self.posts[0])
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).view_count, 1)
+
+    def test_trending_ranks_recent_views(self):
+        self.view(self.posts[0])
+        self.view(self.posts[2], 2)
+        counters.flush_view_counts()
+        PostDailyViews.objects.create(post=self.posts[1], day=timezone.localdate() - timedelta(days=30), views=100)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('post-trending'))
+        self.assertEqual([post.title for post in response.context['posts']], ["Counted post 2", "Counted post 0"])
+        self.assertContains(response, "2 views")
+
+
+class AuthorOnlyViewTests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="owner", password="supersecret")
+        self.other = User.objects.create_user(username="intruder", password="supersecret")
+        self.post = Post.objects.create(title="Mine", content="Only I may change this.", author=self.author)
+        self.comment = Comment.objects.create(post=self.post, author=self.author, content="My comment")
+        self.client.login(username="owner", password="supersecret")
+
+    def assert_fetched_once(self, url, table):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        fetches = [query['sql'] for query in queries if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql']]
+        self.assertEqual(len(fetches), 1, fetches)
+        return len(queries)
+
+    def test_each_view_fetches_its_object_once(self):
+        self.assert_fetched_once(reverse('post-update', args=[self.post.pk]), 'blog_post')
+        self.assert_fetched_once(reverse('post-delete', args=[self.post.pk]), 'blog_post')
+        self.assert_fetched_once(reverse('comment-update', args=[self.post.pk, self.comment.pk]), 'blog_comment')
+        self.assert_fetched_once(reverse('comment-delete', args=[self.post.pk, self.comment.pk]), 'blog_comment')
+
+    def test_query_counts(self):
+        # session, user, the object (and for the post form, its tags)
+        with self.assertNumQueries(4):
+            self.client.get(reverse('post-update', args=[self.post.pk]))
+        with self.assertNumQueries(3):
+            self.client.get(reverse('post-delete', args=[self.post.pk]))
+        with self.assertNumQueries(3):
+            self.client.get(reverse('comment-update', args=[self.post.pk, self.comment.pk]))
+        with self.assertNumQueries(3):
+            self.client.get(reverse('comment-delete', args=[self.post.pk, self.comment.pk]))
+
+    def test_other_users_are_refused(self):
+        self.client.login(username="intruder", password="supersecret")
+        for url in [
+            reverse('post-update', args=[self.post.pk]),
+            reverse('post-delete', args=[self.post.pk]),
+            reverse('comment-update', args=[self.post.pk, self.comment.pk]),
+            reverse('comment-delete', args=[self.post.pk, self.comment.pk]),
+        ]:
+            self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.post(reverse('comment-delete', args=[self.post.pk, self.comment.pk])).status_code, 403)
+        self.assertTrue(Comment.objects.filter(pk=self.comment.pk).exists())
+
+    def test_author_can_edit_and_delete_a_comment(self):
+        response = self.client.post(reverse('comment-update', args=[self.post.pk, self.comment.pk]), {'content': "Edited"})
+        self.assertRedirects(response, reverse('post-detail', args=[self.post.pk]), fetch_redirect_response=False)
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.content, "Edited")
+        self.client.post(reverse('comment-delete', args=[self.post.pk, self.comment.pk]))
+        self.assertFalse(Comment.objects.filter(pk=self.comment.pk).exists())
+
+
+class CommentModerationTests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username="moderator", password="supersecret")
+        self.user = User.objects.create_user(username="commenter", password="supersecret")
+        self.posts = [Post.objects.create(title=f"Moderated {i}", content="Discuss.", author=self.user) for i in range(2)]
+        self.comments = [
+            Comment.objects.create(post=post, author=self.user, content=f"Comment {i} on {post.title}")
+            for post in self.posts for i in range(3)
+        ]
+        self.client.login(username="moderator", password="supersecret")
+        self.changelist = reverse('admin:blog_comment_changelist')
+
+    def act(self, action, comments):
+        return self.client.post(self.changelist, {'action': action, '_selected_action': [comment.pk for comment in comments]})
+
+    def test_changelist_query_count_does_not_grow_with_comments(self):
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.client.get(self.changelist).status_code, 200)
+        for i in range(10):
+            Comment.objects.create(post=self.posts[i % 2], author=self.admin, content=f"More {i}")
+        with self.assertNumQueries(len(few)):
+            self.client.get(self.changelist)
+
+    def test_unapprove_hides_comments_and_updates_stats(self):
+        post = self.posts[0]
+        hidden = self.comments[:2]
+        with CaptureQueriesContext(connection) as queries:
+            self.act('unapprove_comments', hidden)
+        self.assertEqual(sum(query['sql'].startswith('UPDATE "blog_comment"') for query in queries), 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count, 1)
+
+        response = self.client.get(reverse('post-detail', args=[post.pk]))
+        self.assertNotContains(response, hidden[0].content)
+        self.assertContains(response, self.comments[2].content)
+
+        self.act('approve_comments', hidden)
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count, 3)
+        self.assertContains(self.client.get(reverse('post-detail', args=[post.pk])), hidden[0].content)
+
+    def test_bulk_delete_is_one_statement(self):
+        doomed = [self.comments[0], self.comments[3], self.comments[4]]
+        with CaptureQueriesContext(connection) as queries:
+            self.act('delete_comments', doomed)
+        self.assertEqual(sum(query['sql'].startswith('DELETE') for query in queries), 1)
+        # Session, user, the admin's count, savepoint, the posts, the delete, their stats, release
+        self.assertEqual(len(queries), 8)
+        more = [Comment.objects.create(post=self.posts[0], author=self.user, content=f"More {i}") for i in range(20)]
+        with self.assertNumQueries(8):
+            self.act('delete_comments', more)
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).comment_count, 2)
+        self.assertFalse(Comment.objects.filter(pk__in=[comment.pk for comment in doomed]).exists())
+        self.assertEqual(list(Post.objects.order_by('pk').values_list('comment_count', flat=True)), [2, 1])
+        actions = [name for name, _ in self.client.get(self.changelist).context['action_form'].fields['action'].choices]
+        self.assertNotIn('delete_selected', actions)
+
+    def test_change_form_approval_updates_stats(self):
+        post, comment = self.posts[0], self.comments[0]
+        self.client.get(reverse('post-detail', args=[post.pk]))  # cache the page
+        change = reverse('admin:blog_comment_change', args=[comment.pk])
+        form = {'post': post.pk, 'author': self.user.pk, 'content': comment.content}
+        self.assertEqual(self.client.post(change, form).status_code, 302)  # is_approved left unticked
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count, 2)
+        self.assertNotContains(self.client.get(reverse('post-detail', args=[post.pk])), comment.content)
+
+        self.client.post(change, {**form, 'post': self.posts[1].pk, 'is_approved': 'on'})
+        self.assertEqual(list(Post.objects.order_by('pk').values_list('comment_count', flat=True)), [2, 4])
+
+    def test_unapproved_comments_are_not_counted(self):
+        Comment.objects.create(post=self.posts[1], author=self.user, content="Held back", is_approved=False)
+        self.assertEqual(Post.objects.get(pk=self.posts[1].pk).comment_count, 3)
+        data = self.client.get(reverse('comment-list', args=[self.posts[1].pk]), {'format': 'json'}).json()
+        self.assertNotIn("Held back", [comment['content'] for comment in data['comments']])
+
+
+class PostAPITests(DropBufferedViews, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="apiwriter", password="supersecret")
+        self.posts = [Post.objects.create(title=f"API post {i}", content=f"Long body {i}", author=self.user) for i in range(5)]
+        self.posts[0].tags.add("django")
+        ContentType.objects.get_for_model(Post)  # cached per process outside the tests
+
+    def get(self, url, **params):
+        return self.client.get(url, params, HTTP_ACCEPT='application/json')
+
+    def test_full_post_list(self):
+        with self.assertNumQueries(2):  # posts with their authors, their tags
+            data = self.get(reverse('api-post-list')).json()
+        first = data['results'][0]
+        self.assertEqual(first['title'], "API post 4")
+        self.assertEqual(first['author'], "apiwriter")
+        self.assertEqual(first['content'], "Long body 4")
+        self.assertEqual(data['results'][-1]['tags'], ["django"])
+
+    def test_sparse_fieldset_skips_unused_columns_and_relations(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get(reverse('api-post-list'), fields='id,title').json()
+        self.assertEqual(data['results'][0], {'id': self.posts[4].pk, 'title': "API post 4"})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"content"', queries[0]['sql'])
+        self.assertNotIn('auth_user', queries[0]['sql'])
+
+        response = self.get(reverse('api-post-list'), fields='title,secret')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pagination_walks_every_post_once(self):
+        url, titles = f'{reverse("api-post-list")}?page_size=2&fields=title', []
+        while url:
+            data = self.client.get(url, HTTP_ACCEPT='application/json').json()
+            titles += [post['title'] for post in data['results']]
+            url = data['next']
+        self.assertEqual(titles, [f"API post {i}" for i in reversed(range(5))])
+        self.assertEqual(self.get(reverse('api-post-list'), cursor="bogus").status_code, 404)
+
+    def test_tag_filter_comments_and_tags(self):
+        data = self.get(reverse('api-post-list'), tag='django', fields='title').json()
+        self.assertEqual(data['results'], [{'title': "API post 0"}])
+
+        Comment.objects.create(post=self.posts[0], author=self.user, content="Shown")
+        Comment.objects.create(post=self.posts[0], author=self.user, content="Hidden", is_approved=False)
+        data = self.get(reverse('api-comment-list', args=[self.posts[0].pk])).json()
+        self.assertEqual([comment['content'] for comment in data['results']], ["Shown"])
+
+        data = self.get(reverse('api-tag-list'), fields='name,post_count').json()
+        self.assertEqual(data['results'], [{'name': "django", 'post_count': 1}])
+
+    def test_post_detail(self):
+        data = self.get(reverse('api-post-detail', args=[self.posts[1].pk]), fields='title,excerpt').json()
+        self.assertEqual(data, {'title': "API post 1", 'excerpt': "Long body 1"})
+        self.assertEqual(self.get(reverse('api-post-detail', args=[0])).status_code, 404)
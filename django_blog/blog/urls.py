@@ -1,8 +1,15 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from blog import views
-from .views import PostListView, PostDetailView, PostCreateView, PostSearchView, PostUpdateView, PostDeleteView, PostByTagListView
+from blog import api, views
+from .views import PostListView, PostDetailView, PostCreateView, PostSearchView, PostUpdateView, PostDeleteView, PostByTagListView, TagCloudView
 
+# Read paths are served by their async twins when running under ASGI with BLOG_ASYNC_VIEWS on
+if settings.BLOG_ASYNC_VIEWS:
+    PostListView = views.AsyncPostListView
+    PostDetailView = views.AsyncPostDetailView
+    PostSearchView = views.AsyncPostSearchView
+    PostByTagListView = views.AsyncPostByTagListView
 
 
 urlpatterns =[
@@ -15,12 +22,14 @@ urlpatterns =[
 
     #Blog post URLs
     path('post/', PostListView.as_view(), name='post-list'),   
+    path('post/trending/', views.TrendingPostListView.as_view(), name='post-trending'),
     path('post/<int:pk>/', PostDetailView.as_view(), name='post-detail'),
     path('post/new/', PostCreateView.as_view(), name='post-create'),
     path('post/<int:pk>/update/', PostUpdateView.as_view(), name='post-update'),
     path('post/<int:pk>/delete/', PostDeleteView.as_view(), name='post-delete'),
 
     # Comment URLs
+    path('post/<int:pk>/comments/', views.CommentListView.as_view(), name='comment-list'),
     path('post/<int:pk>/comments/new/', views.CommentCreateView.as_view(), name='comment-create'),
     path('posts/<int:post_id>/comment/<int:pk>/update/', views.CommentUpdateView.as_view(), name='comment-update'),
     path('posts/<int:post_id>/comment/<int:pk>/delete/', views.CommentDeleteView.as_view(), name='comment-delete'),
@@ -29,5 +38,18 @@ urlpatterns =[
     path('search/', PostSearchView.as_view(), name='post-search'),
 
     #tag URLs
+    path('tags/', TagCloudView.as_view(), name='tag-cloud'),
     path('tags/<slug:tag_slug>/', PostByTagListView.as_view(), name='posts-by-tag'),
+
+    #JSON API URLs
+    path('api/posts/', api.PostAPIList.as_view(), name='api-post-list'),
+    path('api/posts/<int:pk>/', api.PostAPIDetail.as_view(), name='api-post-detail'),
+    path('api/posts/<int:pk>/comments/', api.CommentAPIList.as_view(), name='api-comment-list'),
+    path('api/tags/', api.TagAPIList.as_view(), name='api-tag-list'),
+
+    #Feed and sitemap URLs
+    path('feeds/<str:feed_format>/', views.post_feed, name='post-feed'),
+    path('tags/<slug:tag_slug>/feeds/<str:feed_format>/', views.post_feed, name='tag-feed'),
+    path('sitemap.xml', views.sitemap_index, name='sitemap'),
+    path('sitemap-posts-<int:section>.xml', views.sitemap_section, name='sitemap-section'),
 ]
\ No newline at end of file
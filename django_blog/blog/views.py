@@ -1,12 +1,38 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from .forms import PostForm, ProfileUpdateForm, SignUpForm, UserUpdateForm, CommentForm
-from .models import Post, Profile, Comment
+from .models import Post, Profile, Comment, TagStat
+from taggit.models import Tag
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse, reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import Q
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from .cache import afragment_is_cached, fragment_cache_timeout, post_cache_version, post_list_cache_version, tag_cloud_cache_version
+from .counters import count_view, trending_ranking
+from .conditional import apost_freshness, post_detail_etag, post_list_etag
+from .feeds import (
+    FEED_TYPES, feed_document, feed_etag, feed_freshness, sitemap_index_document, sitemap_index_etag,
+    sitemap_section_document, sitemap_section_etag, sitemap_sections,
+)
+from .images import enqueue_profile_picture_processing
+from .pagination import KeysetPaginationMixin, KeysetPaginator
+from .profiling import query_budget
+from .search import get_search_engine, tagged_post_ids
+
+# Comments are shown newest first, a page at a time: the post page renders the
+# first one and CommentListView serves the rest.
+COMMENT_KEYSET = ('-created_at', '-pk')
+
+
+def comments_per_page():
+    return getattr(settings, 'BLOG_COMMENTS_PER_PAGE', 20)
+
 
 # Create your views here.
 def register(request):
@@ -17,8 +43,11 @@ def register(request):
             #If profile_picture was uploaded, save it to the profile
             profile_picture = request.FILES.get('profile_picture')
             if profile_picture:
+                # user.profile is already cached by the create_user_profile signal
                 user.profile.profile_picture = profile_picture
-                user.profile.save()
+                user.profile.save(update_fields=['profile_picture'])
+                # Resizing and thumbnails happen off the request thread
+                enqueue_profile_picture_processing(user.profile)
             login(request, user)  # Log the user in after blog
             return redirect('profile')  # Redirect to a profile page
     else:
@@ -27,18 +56,32 @@ def register(request):
 
 @login_required # Ensure the user is logged in to view their profile
 def profile(request):
+    # A plain read, so that viewing the page doesn't pin the user to the primary. Profiles
+    # are created with their users; one missing for an older account is saved with the form.
+    try:
+        user_profile = Profile.objects.get(user=request.user)
+    except Profile.DoesNotExist:
+        user_profile = Profile(user=request.user)
     if request.method == 'POST':
         u_form = UserUpdateForm(request.POST, instance=request.user)
-        p_form = ProfileUpdateForm(request.POST, request.FILES, instance=request.user.profile)
+        p_form = ProfileUpdateForm(request.POST, request.FILES, instance=user_profile)
 
         if u_form.is_valid() and p_form.is_valid():
-            u_form.save()
-            p_form.save()
+            # Only write the rows whose data actually changed
+            if u_form.has_changed():
+                u_form.save()
+            if p_form.has_changed() or user_profile.pk is None:
+                picture_changed = 'profile_picture' in p_form.changed_data
+                if picture_changed:
+                    p_form.instance.profile_picture_processed_at = None
+                p_form.save()
+                if picture_changed and user_profile.profile_picture:
+                    enqueue_profile_picture_processing(user_profile)
             return redirect('profile')
     else:
         u_form = UserUpdateForm(instance=request.user)
-        p_form = ProfileUpdateForm(instance=request.user.profile)
-    return render(request, 'blog/profile.html', {'u_form': u_form, 'p_form': p_form})
+        p_form = ProfileUpdateForm(instance=user_profile)
+    return render(request, 'blog/profile.html', {'u_form': u_form, 'p_form': p_form, 'profile': user_profile})
 
 def home(request):
     return render(request, 'blog/home.html')
@@ -47,24 +90,94 @@ def posts(request):
     return render(request, 'blog/posts.html')
 
 
+class AuthorRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
+    """Only the author may change the object.
+
+    The object is fetched once per request, for the check and for the view itself.
+    """
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
+
+    def test_func(self):
+        # Compare ids so the check doesn't load the author
+        return self.get_object().author_id == self.request.user.pk
+
+
 #CRUD views for blog posts
 
 # 1. ListView: List all blog posts (R - Read All)
-class PostListView(ListView):
+# Conditional GET: unchanged pages are answered with 304 Not Modified before rendering
+@method_decorator(condition(etag_func=post_list_etag), name='get')
+class PostListView(KeysetPaginationMixin, ListView):
     model = Post
     template_name = 'blog/post_list.html'
     context_object_name = 'posts'
     ordering = ['-published_date']  # Newest posts first
+    # Most queries a request may run (see blog/profiling.py): session, user, page of posts, their tags
+    query_budget = 4
+    # ?order=... -> (label, cursor pagination keyset); each keyset is backed by an index on Post
+    orderings = {
+        'newest': ('Newest', ('-published_date', '-pk')),
+        'active': ('Most active', ('-last_activity', '-pk')),
+        'discussed': ('Most discussed', ('-comment_count', '-pk')),
+    }
+    default_order = 'newest'
+
+    def get_order(self):
+        order = self.request.GET.get('order')
+        return order if order in self.orderings else self.default_order
+
+    def get_keyset(self):
+        return self.orderings[self.get_order()][1]
+
+    def get_queryset(self):
+        # Load authors in the same query and all tags of the page in one more
+        queryset = super().get_queryset().select_related('author').prefetch_related('tags')
+        if self.get_order() == 'active':
+            queryset = queryset.with_last_activity()
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['current_order'] = self.get_order()
+        context['orderings'] = [(key, label) for key, (label, _) in self.orderings.items()]
+        # The page of posts is only fetched if the cached fragment has expired
+        context['post_list_version'] = post_list_cache_version()
+        context['fragment_cache_timeout'] = fragment_cache_timeout()
+        return context
 
 # 2. DetailView: Show details of a single post (R - Read One)
+@method_decorator(condition(etag_func=post_detail_etag), name='get')
 class PostDetailView(DetailView):
     model = Post
     template_name = 'blog/post_detail.html'
     context_object_name = 'post'
+    query_budget = 6
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('author').prefetch_related('tags')
+
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        # Counted in memory and written in batches (see blog/counters.py); 304s don't count
+        count_view(self.object.pk)
+        return response
+
+    def get_comments_paginator(self):
+        return KeysetPaginator(self.object.comments.filter(is_approved=True).select_related('author'), comments_per_page(), COMMENT_KEYSET)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['comments'] = self.object.comments.all().order_by('-created_at')  # fetch related comments
+        # First page of comments with their authors; only fetched if the cached fragment has expired
+        context['comments'] = self.get_comments_paginator().lazy_page()
+        # Fragments for this post are cached until the post or its comments change
+        context['post_version'] = post_cache_version(self.object.pk)
+        context['fragment_cache_timeout'] = fragment_cache_timeout()
         if self.request.user.is_authenticated:
             context['comment_form'] = CommentForm()
         return context
@@ -86,7 +199,7 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         return context
 
 # 4. UpdateView: Update an existing post (only the author can edit) (U - Update)
-class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class PostUpdateView(AuthorRequiredMixin, UpdateView):
     model = Post
     form_class = PostForm
     template_name = 'blog/post_form.html'
@@ -94,9 +207,6 @@ class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def form_valid(self, form):
         form.instance.author = self.request.user  # ensure the author remains the same
         return super().form_valid(form)
-    def test_func(self):
-        post = self.get_object()
-        return self.request.user == post.author  # only allow the author to edit
     def get_success_url(self):
         return reverse('post-list')
     def get_context_data(self, **kwargs):
@@ -105,18 +215,52 @@ class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return context
 
 # 5. DeleteView: Delete a post (only the author can delete) (D - Delete)
-class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class PostDeleteView(AuthorRequiredMixin, DeleteView):
     model = Post
     template_name = 'blog/post_confirm_delete.html'
     # Redirect to the blog list after successful deletion
     success_url = reverse_lazy('post-list')
 
-    def test_func(self):
-        post = self.get_object()
-        return self.request.user == post.author  # only allow the author to delete
-    
 #Comment views
 
+#1. ListView: Further pages of a post's comments, as an HTML fragment or JSON (R - Read All)
+class CommentListView(KeysetPaginationMixin, ListView):
+    template_name = 'blog/_comment_list.html'
+    keyset = COMMENT_KEYSET
+    query_budget = 3  # session, user, page of comments with their authors
+
+    def get_paginate_by(self, queryset):
+        return comments_per_page()
+
+    def get_queryset(self):
+        return Comment.objects.filter(post_id=self.kwargs['pk'], is_approved=True).select_related('author')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['comment_page'] = context['page_obj']
+        context['post_id'] = self.kwargs['pk']
+        return context
+
+    def wants_json(self):
+        return self.request.GET.get('format') == 'json' or not self.request.accepts('text/html')
+
+    def render_to_response(self, context, **response_kwargs):
+        if not self.wants_json():
+            return super().render_to_response(context, **response_kwargs)
+        page = context['comment_page']
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'content': comment.content,
+                    'created_at': comment.created_at.isoformat(),
+                }
+                for comment in page
+            ],
+            'next_cursor': page.next_cursor,
+        })
+
 #2. CreateView: Add a comment to a post (only logged-in users) (C - Create)
 class CommentCreateView(LoginRequiredMixin, CreateView):
     model = Comment
@@ -132,37 +276,34 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
         return reverse('post-detail', kwargs={'pk': self.kwargs['pk']})
     
 #3. UpdateView: Update a comment (only the author can edit) (U - Update)
-class CommentUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class CommentUpdateView(AuthorRequiredMixin, UpdateView):
     model = Comment
     form_class = CommentForm
     template_name = 'blog/comment_form.html'
 
-    def test_func(self):
-        comment = self.get_object()
-        return self.request.user == comment.author
-
     def get_success_url(self):
-        return reverse('post-detail', kwargs={'pk': self.object.post.pk})
+        return reverse('post-detail', kwargs={'pk': self.object.post_id})
     
 #4. DeleteView: Delete a comment (only the author can delete) (D - Delete)
-class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class CommentDeleteView(AuthorRequiredMixin, DeleteView):
     model = Comment
     template_name = 'blog/comment_confirm_delete.html'
 
-    def test_func(self):
-        comment = self.get_object()
-        return self.request.user == comment.author
-
     def get_success_url(self):
-        return reverse('post-detail', kwargs={'pk': self.object.post.pk})
+        return reverse('post-detail', kwargs={'pk': self.object.post_id})
     
 
 # 5. PostByTagListView: List posts filtered by a specific tag
-class PostByTagListView(ListView):
+@method_decorator(condition(etag_func=post_list_etag), name='get')
+class PostByTagListView(KeysetPaginationMixin, ListView):
     model = Post
     template_name = 'blog/post_list.html' # Reuse the existing post list template
     context_object_name = 'posts'
     ordering = ['-published_date'] 
+    keyset = ('-published_date', '-pk')
+    # session, user, the page of posts with their authors, their tags, and once per process
+    # the Post content type that tagged_post_ids() looks up
+    query_budget = 5
 
     def get_queryset(self):
         # 1. Get the tag_slug from the URL keywords (kwargs)
@@ -170,8 +311,8 @@ class PostByTagListView(ListView):
         
         if tag_slug:
             # 2. Filter the Post queryset to include only posts with that tag
-            # The 'tags' field is a TaggableManager, and its filter method uses a slug.
-            return Post.objects.filter(tags__slug=tag_slug).distinct()
+            # A subquery on the tagged items avoids the join fan-out (and the .distinct()) of tags__slug.
+            return Post.objects.filter(pk__in=tagged_post_ids(slug=tag_slug)).select_related('author').prefetch_related('tags')
         
         # Fallback to all posts if no tag is provided (though the URL pattern prevents this)
         return super().get_queryset()
@@ -183,20 +324,144 @@ class PostByTagListView(ListView):
         if tag_slug:
             # Capitalize and replace hyphens for display purposes
             context['current_tag'] = tag_slug.replace('-', ' ').title()
+        context['post_list_version'] = post_list_cache_version()
+        context['fragment_cache_timeout'] = fragment_cache_timeout()
         return context
     
+# 6. TagCloudView: Most used tags, read from the precomputed TagStat table
+class TagCloudView(ListView):
+    model = TagStat
+    template_name = 'blog/tag_cloud.html'
+    context_object_name = 'tag_stats'
+    max_tags = 100
+    query_budget = 3
+
+    def get_queryset(self):
+        return TagStat.objects.select_related('tag').filter(post_count__gt=0).order_by('-post_count', 'tag__name')[:self.max_tags]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # The stats are only queried when the cached cloud has expired
+        context['tag_cloud_version'] = tag_cloud_cache_version()
+        context['fragment_cache_timeout'] = fragment_cache_timeout()
+        return context
+
+# 7. TrendingPostListView: Most viewed posts of the last few days, from the batched view counts
+class TrendingPostListView(ListView):
+    template_name = 'blog/trending.html'
+    context_object_name = 'posts'
+    query_budget = 4  # session, user, the ranking (cached between flushes), the posts with their authors
+
+    def get_queryset(self):
+        ranking = dict(trending_ranking())
+        posts = list(Post.objects.filter(pk__in=ranking).select_related('author'))
+        for post in posts:
+            post.recent_views = ranking[post.pk]
+        return sorted(posts, key=lambda post: (-post.recent_views, -post.pk))
+
 #Search functionality
 class PostSearchView(ListView):
     model = Post
     template_name = 'blog/post_search.html'
     context_object_name = 'posts'
+    query_budget = 4  # session, user, the results, and once per process the Post content type (tag matches)
 
     def get_queryset(self):
         query = self.request.GET.get('q')
         if query:
-            return Post.objects.filter(
-                Q(title__icontains=query) |
-                Q(content__icontains=query) |
-                Q(tags__name__icontains=query)
-            ).distinct()
-        return Post.objects.all()
\ No newline at end of file
+            # Ranked results from the configured search engine (see blog/search.py)
+            return get_search_engine().search(query)
+        return Post.objects.order_by('-published_date')
+
+#Feeds and sitemap (see blog/feeds.py)
+# Documents that haven't changed are answered with 304 Not Modified after one small query
+
+#1. RSS or Atom feed of the latest posts, site-wide or for one tag
+# freshness, and for new or edited posts: the posts with their authors, their tags;
+# tag feeds also look up the Post content type once per process
+@query_budget(4)
+@condition(etag_func=feed_etag)
+def post_feed(request, feed_format, tag_slug=None):
+    if feed_format not in FEED_TYPES:
+        raise Http404("Unknown feed format")
+    if tag_slug is not None and not feed_freshness(request, tag_slug) and not Tag.objects.filter(slug=tag_slug).exists():
+        raise Http404("No tag found matching the query")
+    return HttpResponse(feed_document(request, feed_format, tag_slug), content_type=FEED_TYPES[feed_format].content_type)
+
+#2. Sitemap index, listing one sitemap per section of posts
+@query_budget(1)
+@condition(etag_func=sitemap_index_etag)
+def sitemap_index(request):
+    return HttpResponse(sitemap_index_document(request), content_type='application/xml')
+
+#3. One section of the sitemap
+@query_budget(3)  # section count, freshness, and when it changed: the section's posts
+@condition(etag_func=sitemap_section_etag)
+def sitemap_section(request, section):
+    if not 1 <= section <= sitemap_sections(request):
+        raise Http404("No such sitemap section")
+    return HttpResponse(sitemap_section_document(request, section), content_type='application/xml')
+
+
+# Async read views (served instead of the ones above when BLOG_ASYNC_VIEWS is on, see urls.py)
+# Under ASGI they run on the event loop instead of occupying a thread per request.
+# Everything the template needs is loaded with the async ORM before rendering,
+# except data that only a fragment already in the cache would have used.
+class AsyncReadMixin:
+    async def prepare(self, request):
+        # Resolve the lazy request.user now, so nothing touches the database synchronously later
+        request.user = await request.auser()
+        # tagged_post_ids() looks up the Post content type, which is cached per process after the first time
+        await sync_to_async(ContentType.objects.get_for_model)(Post)
+
+
+class AsyncKeysetListMixin(AsyncReadMixin):
+    async def get(self, request, *args, **kwargs):
+        await self.prepare(request)
+        self.object_list = self.get_queryset()
+        self.loaded_page = None
+        if not await afragment_is_cached('post_list', post_list_cache_version(), request.get_full_path()):
+            self.loaded_page = await self.apaginate_queryset(self.object_list, self.get_paginate_by(self.object_list))
+        return self.render_to_response(self.get_context_data())
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.loaded_page is not None:
+            return self.loaded_page
+        return super().paginate_queryset(queryset, page_size)
+
+
+@method_decorator(condition(etag_func=post_list_etag), name='get')
+class AsyncPostListView(AsyncKeysetListMixin, PostListView):
+    pass
+
+
+@method_decorator(condition(etag_func=post_list_etag), name='get')
+class AsyncPostByTagListView(AsyncKeysetListMixin, PostByTagListView):
+    pass
+
+
+class AsyncPostDetailView(AsyncReadMixin, PostDetailView):
+    async def get(self, request, *args, **kwargs):
+        # Fetch the freshness row here; the (synchronous) etag functions then find it cached
+        await apost_freshness(request, kwargs['pk'])
+        return await self.conditional_get(request, *args, **kwargs)
+
+    @method_decorator(condition(etag_func=post_detail_etag))
+    async def conditional_get(self, request, *args, **kwargs):
+        await self.prepare(request)
+        try:
+            self.object = await self.get_queryset().aget(pk=kwargs['pk'])
+        except Post.DoesNotExist:
+            raise Http404("No post found matching the query")
+        context = self.get_context_data(object=self.object)
+        if not await afragment_is_cached('post_comments', self.object.pk, context['post_version'], request.user.pk):
+            context['comments'] = await self.get_comments_paginator().apage()
+        await sync_to_async(count_view)(self.object.pk)
+        return self.render_to_response(context)
+
+
+class AsyncPostSearchView(AsyncReadMixin, PostSearchView):
+    async def get(self, request, *args, **kwargs):
+        await self.prepare(request)
+        self.object_list = [post async for post in self.get_queryset()]
+        return self.render_to_response(self.get_context_data())
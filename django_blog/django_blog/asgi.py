@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_blog.settings')
 
 application = get_asgi_application()
+
+# Write the page views still buffered in memory when a worker exits (see blog/counters.py)
+from blog.counters import flush_on_exit  # noqa: E402
+
+flush_on_exit()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,7 +44,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it sees every query the other middleware and the view run
+    'blog.profiling.QueryProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'blog.routers.PrimaryStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -83,9 +87,65 @@ DATABASES = {
         'PASSWORD': 'blog_pass',
         'HOST': 'db',  # must match service name in docker-compose.yml
         'PORT': '5432',
+        # Check a pooled connection is still alive before handing it to a request
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Requests borrow a connection from a per-process psycopg pool and
+            # return it when they finish, instead of connecting to Postgres
+            # every time. Connections are recycled after max_lifetime (with
+            # jitter, so they don't all reconnect at once) and idle ones above
+            # min_size are closed after max_idle.
+            'pool': {
+                'min_size': 2,
+                'max_size': int(os.environ.get('BLOG_DB_POOL_SIZE', 10)),
+                'timeout': 10,
+                'max_idle': 300,
+                'max_lifetime': 1800,
+            },
+        },
     }
 }
 
+# Read replicas: BLOG_DB_REPLICA_HOSTS="replica1,replica2" adds aliases replica_0, replica_1, ...
+# with the primary's credentials. Blog and tag reads are spread over them by
+# blog.routers.ReadReplicaRouter; writes (and a user's reads right after a write)
+# stay on the primary.
+for index, host in enumerate(filter(None, os.environ.get('BLOG_DB_REPLICA_HOSTS', '').split(','))):
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+BLOG_READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['blog.routers.ReadReplicaRouter']
+# Seconds a user's reads stay on the primary after they create or change something
+BLOG_REPLICA_STICKY_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per process: with several workers use a shared backend
+# (file-based, Redis or Memcached) so that invalidations reach every worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'django-blog',
+    },
+    # Rendered feeds, sitemap sections and feed entries (see blog/feeds.py). They are
+    # keyed by their contents, so nothing here is ever stale; old files are culled.
+    'feeds': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'feeds',
+        'TIMEOUT': 60 * 60 * 24 * 7,
+        'OPTIONS': {'MAX_ENTRIES': 20_000},
+    },
+}
+
+# Seconds a rendered post/list fragment may stay cached (it is invalidated on change anyway)
+BLOG_FRAGMENT_CACHE_TIMEOUT = 60 * 15
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,7 +198,57 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# comments
+# Comments shown on a post page, and loaded per "Load more comments" click
+BLOG_COMMENTS_PER_PAGE = 20
+
+# feeds and sitemap (see blog/feeds.py)
+# Posts per RSS/Atom feed, and posts per sitemap section (at most 50,000 per sitemap file)
+BLOG_FEED_ITEMS = 20
+BLOG_SITEMAP_SECTION_SIZE = 10_000
+
+# view counts (see blog/counters.py)
+# Post views are buffered per process and written at most every this many seconds,
+# and when a server process exits; trending posts are the most viewed of the last
+# BLOG_TRENDING_DAYS days.
+BLOG_VIEW_COUNT_FLUSH_INTERVAL = 30
+BLOG_TRENDING_DAYS = 7
+BLOG_TRENDING_POSTS = 10
+
+# async views
+# Serve the post list, detail, tag and search pages with async views (blog/views.py).
+# Worth it under ASGI (see asgi.py); under WSGI each request would start an event loop.
+BLOG_ASYNC_VIEWS = os.environ.get('BLOG_ASYNC_VIEWS') == '1'
+
+# background tasks (see blog/tasks.py)
+# 'thread' runs tasks such as profile picture processing on an in-process thread pool
+# after the request commits; 'sync' runs them inline.
+BLOG_TASK_RUNNER = 'thread'
+BLOG_TASK_WORKERS = 2
+
 # auth redirects
 LOGIN_REDIRECT_URL = 'profile'
 LOGOUT_REDIRECT_URL = 'login'
-LOGIN_URL = 'login'
\ No newline at end of file
+LOGIN_URL = 'login'
+
+# search
+# Dotted path to the engine used by PostSearchView, e.g. 'blog.search.SimpleSearchEngine'.
+# None picks Postgres full-text search on Postgres and the simple engine elsewhere.
+BLOG_SEARCH_ENGINE = None
+# query profiling (see blog/profiling.py)
+# Views over their query budget fail loudly while developing and in tests, and
+# are logged as warnings in production.
+QUERY_BUDGETS_ENFORCE = DEBUG
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # One JSON line per request with its query count, SQL time and slowest statements
+        # (with DEBUG on the X-Query-Profile header carries them and only overruns are logged)
+        'blog.queries': {'handlers': ['console'], 'level': 'WARNING' if DEBUG else 'INFO', 'propagate': False},
+    },
+}